@@ -0,0 +1,67 @@
+"""Board graphics from printman.assets: drawn from scratch, read back
+from the cache dir, and served from the in-process memo, and the
+SpriteAtlas the sprites are cut from.
+
+Each picture is also checked against the copy gfx.main wrote to gfx/.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import bench
+
+import printman.assets as assets
+import printman.board as board
+import printman.game as game
+
+BOARDS = [game.MetaBoard, board.MediumBoard, board.SmallBoard,
+          board.PracticeBoard, board.ClassicBoard]
+NAMES = ["board", "pill"] + ["%s.%s" % (kind, dirn)
+                             for kind in ("pacman", "monster")
+                             for dirn in ("left", "right", "up", "down")]
+
+
+def get_all():
+    return [assets.get(b, 384, name) for b in BOARDS for name in NAMES]
+
+
+def main():
+    assets.CACHE_DIR = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        drawn = get_all()
+        cold = time.time() - start
+        for asset, (b, name) in zip(drawn, [(b, name) for b in BOARDS
+                                            for name in NAMES]):
+            path = os.path.join(bench.ROOT, "gfx", b.__name__, name + ".png")
+            with open(path, "rb") as fh:
+                assert fh.read() == asset.data, path
+
+        def from_disk():
+            assets._assets.clear()
+            get_all()
+        count = len(drawn)
+        bench.report("drawn", cold, count, "assets")
+        bench.report("cache dir", bench.best_of(from_disk), count, "assets")
+        bench.report("memo", bench.best_of(get_all), count, "assets")
+
+        sizes = sorted(set(assets.cell_size(b, 384) for b in BOARDS))
+        atlases = [assets.SpriteAtlas.draw(size) for size in sizes]
+        dumped = [atlas.dumps() for atlas in atlases]
+        for atlas, data in zip(atlases, dumped):
+            assert assets.SpriteAtlas.loads(data).sprites == atlas.sprites
+        print "atlas files: %s bytes" % ", ".join(str(len(data))
+                                                 for data in dumped)
+        bench.report("SpriteAtlas.draw", bench.best_of(
+            lambda: [assets.SpriteAtlas.draw(size) for size in sizes]),
+            len(sizes), "atlases")
+        bench.report("SpriteAtlas.loads", bench.best_of(
+            lambda: [assets.SpriteAtlas.loads(data) for data in dumped]),
+            len(sizes), "atlases")
+    finally:
+        shutil.rmtree(assets.CACHE_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Each script is run directly from the top of the repository, e.g.:
+
+    python benchmarks/turns.py
+"""
+import ast
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def best_of(func, repeat=5):
+    """Run `func` `repeat` times and return the fastest time in seconds."""
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(name, seconds, count=None, unit="ops"):
+    if count is None:
+        print "%-40s %10.2f ms" % (name, seconds * 1000)
+    else:
+        print "%-40s %10.2f ms %12.0f %s/s" % (
+            name, seconds * 1000, count / seconds, unit)
+
+
+def _main_value(name):
+    """The value main.py assigns to `name`, read without importing webapp2."""
+    with open(os.path.join(ROOT, "main.py")) as fh:
+        tree = ast.parse(fh.read())
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Assign) and
+                getattr(node.targets[0], "id", None) == name):
+            return ast.literal_eval(node.value)
+    raise KeyError(name)
+
+
+def sample_game():
+    """main.SampleHandler.SAMPLE_GAME."""
+    return _main_value("SAMPLE_GAME")
+
+
+def page_width():
+    """main.PAGE_WIDTH."""
+    return _main_value("PAGE_WIDTH")
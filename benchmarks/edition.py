@@ -0,0 +1,55 @@
+"""CPU time to draw and encode one edition with printman.render.
+
+Draws SAMPLE_GAME (a ClassicBoard part way through) with its QR code,
+then encodes it as a PNG.  The QR code is built once up front: its cost
+is the same whichever way the edition is drawn.
+"""
+import cStringIO as StringIO
+import time
+
+import bench
+
+import printman.board
+import printman.game as game
+import printman.qrcode.main as qrcode
+import printman.render as render
+
+EDITIONS = 50
+PAGE_WIDTH = bench.page_width()
+
+
+def cpu_best_of(func, repeat=EDITIONS):
+    best = None
+    for i in range(repeat):
+        start = time.clock()
+        func()
+        elapsed = time.clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    board = game.Board.load(bench.sample_game())
+    qr = qrcode.QRCode(box_size=2, border=0, version=5)
+    qr.add_data("http://localhost:8080/p/?g=0123456789abcdef")
+    qr.make()
+    qr_sprite = render.Sprite.from_modules(qr.modules, qr.box_size)
+    canvas = render.draw_edition(board, PAGE_WIDTH, qr_sprite)  # load the sprites
+
+    def encode():
+        canvas.write(StringIO.StringIO())
+
+    def both():
+        render.draw_edition(board, PAGE_WIDTH, qr_sprite).write(StringIO.StringIO())
+
+    out = StringIO.StringIO()
+    canvas.write(out)
+    print "edition: %dx%d, %d bytes" % (canvas.width, canvas.height, len(out.getvalue()))
+    bench.report("draw", cpu_best_of(lambda: render.draw_edition(board, PAGE_WIDTH, qr_sprite)))
+    bench.report("encode", cpu_best_of(encode))
+    bench.report("draw + encode", cpu_best_of(both))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Drawing a game's editions turn after turn on ClassicBoard, in full with
+draw_edition and from the previous turn's frame with render_edition.
+
+Each game is a new ClassicBoard played with random directions until it
+ends, the game over edition included; every incremental edition is
+checked against the full one.
+"""
+import random
+import time
+
+import bench
+
+import printman.board as board
+import printman.game as game
+import printman.qrcode.main as qrcode
+import printman.render as render
+
+GAMES = 8
+PAGE_WIDTH = bench.page_width()
+
+
+def play(seed):
+    """The boards of a new ClassicBoard game, from the start to the end
+    (random directions don't last long)."""
+    rand = random.Random(seed)
+    current = board.ClassicBoard()
+    current.start()
+    out = [game.Board.load(current.dump())]
+    while current.mode == game.STARTED:
+        current.dirn = rand.choice((game.LEFT, game.RIGHT, game.UP, game.DOWN))
+        current.do_turn()
+        out.append(game.Board.load(current.dump()))
+    return out
+
+
+def qr_sprite(game_key):
+    qr = qrcode.QRCode(box_size=2, border=0, version=5)
+    qr.add_data("http://localhost:8080/p/?g=%s" % game_key)
+    qr.make()
+    return render.Sprite.from_modules(qr.modules, qr.box_size)
+
+
+def main():
+    games = [("%d.0123abcd" % (5629499534213120 + seed), play(seed))
+             for seed in range(GAMES)]
+    qrs = dict((key, qr_sprite(key)) for key, turns in games)
+    for key, turns in games:
+        # Load the sprites, the game over ones included
+        render.draw_edition(turns[-1], PAGE_WIDTH, qrs[key])
+
+    full = 0.0
+    expected = {}
+    for key, turns in games:
+        for current in turns[1:]:
+            start = time.time()
+            canvas = render.draw_edition(current, PAGE_WIDTH, qrs[key])
+            full += time.time() - start
+            expected[key, current.turn] = canvas.rows
+
+    render.FRAMES.clear()
+    for key, turns in games:
+        # The edition before: its frame is already kept
+        render.render_edition(key, turns[0], PAGE_WIDTH, qrs[key])
+    incremental = 0.0
+    for key, turns in games:
+        for current in turns[1:]:
+            start = time.time()
+            canvas = render.render_edition(key, current, PAGE_WIDTH, qrs[key])
+            incremental += time.time() - start
+            assert canvas.rows == expected[key, current.turn], (key, current.turn)
+
+    repeat = 0.0
+    for key, turns in games:
+        for current in turns[1:]:
+            start = time.time()
+            render.render_edition(key, current, PAGE_WIDTH, qrs[key])
+            repeat += time.time() - start
+
+    count = len(expected)
+    print "%d editions from %d games; frames kept: %d bytes" % (
+        count, len(games), render.FRAMES.size)
+    bench.report("draw_edition (full)", full, count, "editions")
+    bench.report("render_edition (previous turn)", incremental, count, "editions")
+    bench.report("render_edition (same turn)", repeat, count, "editions")
+
+
+if __name__ == "__main__":
+    main()
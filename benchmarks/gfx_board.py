@@ -0,0 +1,162 @@
+"""Drawing the board backgrounds, as gfx.main does for every board.
+
+The "per pixel" rows run draw_grid's erode, invert and outline passes
+with the old implementations, which looped over a list of 0s and 1s per
+row and caught IndexError at the edges.  The new ones work on a row of
+pixels at a time, as an int.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import bench
+
+import printman.game as game
+import printman.board as board
+import printman.gfx as gfx
+
+BOARDS = [game.MetaBoard, board.MediumBoard, board.SmallBoard,
+          board.PracticeBoard, board.ClassicBoard]
+
+
+def legacy_erode(data, edge):
+    def any_bits(x, y):
+        if data[y][x]:
+            return True
+        if y == 0 or x == 0:
+            return edge
+        if data[y][x-1] or data[y-1][x]:
+            return True
+        try:
+            if data[y+1][x]:
+                return True
+            if data[y][x+1]:
+                return True
+        except IndexError:
+            return edge
+        return False
+    return [[1 if any_bits(x, y) else 0 for x in range(len(row))]
+            for y, row in enumerate(data)]
+
+
+def legacy_outline(data):
+    def any_different(x, y, test):
+        if y > 0 and data[y-1][x] != test:
+            return True
+        if x > 0 and data[y][x-1] != test:
+            return True
+        try:
+            if data[y+1][x] != test:
+                return True
+        except IndexError:
+            pass
+        try:
+            if data[y][x+1] != test:
+                return True
+        except IndexError:
+            pass
+        return False
+    return [[data[y][x] if any_different(x, y, data[y][x]) else 1
+             for x in range(len(row))] for y, row in enumerate(data)]
+
+
+def legacy_invert(grid):
+    return [[0 if c else 1 for c in row] for row in grid]
+
+
+def to_lists(bits, width):
+    return [[int(c) for c in bin(row)[2:].zfill(width)] for row in bits]
+
+
+def to_bits(rows):
+    return [int("".join(str(c) for c in row), 2) for row in rows]
+
+
+def legacy_passes(cells):
+    for i in range(4):
+        cells = legacy_erode(cells, True)
+    cells = legacy_invert(cells)
+    for i in range(2):
+        cells = legacy_erode(cells, False)
+    cells = legacy_invert(cells)
+    out = legacy_outline(cells)
+    cells = legacy_erode(cells, True)
+    cells = legacy_erode(cells, True)
+    return cells, out
+
+
+def check_random():
+    rand = random.Random(19)
+    for i in range(200):
+        width, height = rand.randint(1, 20), rand.randint(1, 20)
+        density = rand.random()
+        rows = [[int(rand.random() < density) for x in range(width)]
+                for y in range(height)]
+        bits = to_bits(rows)
+        for edge in (True, False):
+            assert to_lists(gfx.erode(bits, width, edge), width) == \
+                legacy_erode(rows, edge)
+        assert to_lists(gfx.outline(bits, width), width) == \
+            legacy_outline(rows)
+    print "200 random images: erode and outline match"
+
+
+def initial_cells(board_cls):
+    """The board as draw_grid lays it out, before any of the passes."""
+    captured = []
+    erode = gfx.erode
+
+    def capture(bits, width, edge):
+        if not captured:
+            captured.append(bits)
+        return erode(bits, width, edge)
+    gfx.erode = capture
+    try:
+        gfx.draw_grid(board_cls, 384)
+    finally:
+        gfx.erode = erode
+    return captured[0]
+
+
+def passes(cells, width):
+    for i in range(4):
+        cells = gfx.erode(cells, width, True)
+    cells = gfx.invert(cells, width)
+    for i in range(2):
+        cells = gfx.erode(cells, width, False)
+    cells = gfx.invert(cells, width)
+    out = gfx.outline(cells, width)
+    cells = gfx.erode(cells, width, True)
+    cells = gfx.erode(cells, width, True)
+    return cells, out
+
+
+def main():
+    check_random()
+    gfx.OUT_DIR = tempfile.mkdtemp()
+    try:
+        legacy = new = 0.0
+        for b in BOARDS:
+            os.mkdir(os.path.join(gfx.OUT_DIR, b.__name__))
+            b.setup()
+            cells = initial_cells(b)
+            start = time.time()
+            expected = legacy_passes(to_lists(cells, 384))
+            legacy += time.time() - start
+            start = time.time()
+            result = passes(cells, 384)
+            new += time.time() - start
+            assert [to_lists(bits, 384) for bits in result] == list(expected)
+        count = len(BOARDS)
+        bench.report("board passes (per pixel)", legacy, count, "boards")
+        bench.report("board passes (per row)", new, count, "boards")
+        bench.report("draw_grid, all boards", bench.best_of(
+            lambda: [gfx.draw_grid(b, 384) for b in BOARDS]), count, "boards")
+    finally:
+        shutil.rmtree(gfx.OUT_DIR)
+
+
+if __name__ == "__main__":
+    main()
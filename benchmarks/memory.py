@@ -0,0 +1,50 @@
+"""Memory and time to load 100k saved games.
+
+The saves are the binary form of main.SampleHandler.SAMPLE_GAME (a
+ClassicBoard part way through, with four monsters), each with its own
+turn and score.  All of the loaded boards are kept alive, so the growth
+in peak RSS divided by the number of games is the cost of one loaded
+game.
+"""
+import gc
+import resource
+import struct
+import time
+
+import bench
+
+import printman.board
+import printman.game as game
+
+GAMES = 100000
+
+
+def make_saves(count):
+    blob = game.Board.load(bench.sample_game()).dump()
+    turn_offset = 3  # version, board id, mode
+    head, tail = blob[:turn_offset], blob[turn_offset + 8:]
+    return [head + struct.pack("!II", 84 + i, 1480 + 20 * (i % 100)) + tail
+            for i in range(count)]
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    saves = make_saves(GAMES)
+    printman.board.ClassicBoard.setup()
+    gc.collect()
+    before = peak_rss_kb()
+    start = time.time()
+    games = [game.Board.load(data) for data in saves]
+    elapsed = time.time() - start
+    gc.collect()
+    after = peak_rss_kb()
+    bench.report("load %d saves" % len(games), elapsed, len(games), "games")
+    print "%-40s %10.0f bytes" % ("memory per loaded game",
+                                 (after - before) * 1024.0 / len(games))
+
+
+if __name__ == "__main__":
+    main()
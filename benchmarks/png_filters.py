@@ -0,0 +1,93 @@
+"""PNG size against encoding time for each Writer filter_strategy, on the
+1 bit pictures the app writes (the board backgrounds from gfx and a
+whole edition from render) and, for comparison, some of the pictures in
+static/ as 8 bit RGBA.
+
+Every file is decoded again and checked against the unfiltered one.
+"""
+import cStringIO as StringIO
+import os
+
+import bench
+
+import printman.board
+import printman.game as game
+import printman.gfx as gfx
+import printman.png as png
+import printman.render as render
+
+BOARDS = [game.MetaBoard, printman.board.MediumBoard, printman.board.SmallBoard,
+          printman.board.PracticeBoard, printman.board.ClassicBoard]
+STRATEGIES = (None, "dedup", "adaptive")
+
+
+def images():
+    """(name, width, height, packed rows) for each picture."""
+    out = []
+    for b in BOARDS:
+        b.setup()
+        width, height, bits = gfx.board_bits(b, bench.page_width())
+        canvas = render.Canvas(width, height)
+        canvas.rows = bits
+        out.append(("%s board" % b.__name__, canvas))
+    edition = render.draw_edition(game.Board.load(bench.sample_game()),
+                                  bench.page_width())
+    out.append(("edition", edition))
+    return [(name, canvas.width, canvas.height, canvas.packed_rows())
+            for name, canvas in out]
+
+
+def rgba_images():
+    out = []
+    for name in ("won", "started", "logo"):
+        path = os.path.join(bench.ROOT, "static", name + ".png")
+        width, height, pixels, meta = png.Reader(filename=path).asRGBA8()
+        out.append(("%s.png (RGBA)" % name, width, height,
+                    [png.tostring(png.array("B", row)) for row in pixels]))
+    return out
+
+
+def encode(image, strategy):
+    name, width, height, rows = image
+    if name.endswith("(RGBA)"):
+        writer = png.Writer(width=width, height=height, alpha=True,
+                            filter_strategy=strategy)
+    else:
+        writer = png.Writer(width=width, height=height, greyscale=True,
+                            bitdepth=1, filter_strategy=strategy)
+    buf = StringIO.StringIO()
+    writer.write_packed(buf, rows)
+    return buf.getvalue()
+
+
+def pixels(data):
+    return [list(row) for row in png.Reader(bytes=data).read()[2]]
+
+
+def compare(pictures):
+    for image in pictures:
+        expected = pixels(encode(image, None))
+        for strategy in STRATEGIES[1:]:
+            assert pixels(encode(image, strategy)) == expected, (image[0], strategy)
+    for strategy in STRATEGIES:
+        size = sum(len(encode(image, strategy)) for image in pictures)
+        seconds = bench.best_of(
+            lambda: [encode(image, strategy) for image in pictures])
+        bench.report("%s (%d bytes)" % (strategy, size), seconds,
+                     len(pictures), "images")
+    for image in pictures:
+        print "    %-22s %s" % (image[0], "  ".join(
+            "%s %5d" % (strategy, len(encode(image, strategy)))
+            for strategy in STRATEGIES))
+
+
+def main():
+    print "1 bit boards and edition:"
+    compare(images())
+    print
+    print "8 bit RGBA:"
+    compare(rgba_images())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Peak memory of writing a tall PNG with png.Writer, a row at a time
+with begin/write_row/finish and all at once with write, straight and
+interlaced.
+
+Each case runs in a process of its own (as `png_memory.py <case>`) and
+reports how far its peak resident size grew beyond that of a process
+that only makes the rows, with the time taken and the size of the file.
+"""
+import array
+import resource
+import subprocess
+import sys
+import time
+
+import bench
+
+import printman.png as png
+
+WIDTH = 384
+HEIGHT = 50000
+
+
+def rows():
+    """Rows of a WIDTH by HEIGHT greyscale picture, made as needed."""
+    patterns = [array.array("B", [(x * y) & 0xff for x in range(WIDTH)])
+                for y in range(64)]
+    for y in range(HEIGHT):
+        yield patterns[y % 64][:]
+
+
+class Discard(object):
+    """A file that counts what's written to it and keeps none of it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def make_rows(writer, out):
+    for row in rows():
+        pass
+
+
+def stream(writer, out):
+    writer.begin(out)
+    for row in rows():
+        writer.write_row(row)
+    writer.finish()
+
+
+CASES = [
+    ("rows only", False, make_rows),
+    ("write, list of rows", False,
+     lambda writer, out: writer.write(out, list(rows()))),
+    ("write, generator", False, lambda writer, out: writer.write(out, rows())),
+    ("begin/write_row/finish", False, stream),
+    ("write, interlaced", True, lambda writer, out: writer.write(out, rows())),
+    ("write_row, interlaced", True, stream),
+]
+
+
+def run(name):
+    for case, interlace, func in CASES:
+        if case == name:
+            break
+    else:
+        raise KeyError(name)
+    writer = png.Writer(WIDTH, HEIGHT, greyscale=True, interlace=interlace)
+    out = Discard()
+    start = time.time()
+    func(writer, out)
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print peak, elapsed, out.size
+
+
+def main():
+    print "%d x %d greyscale, %.1f MB of pixels" % (
+        WIDTH, HEIGHT, WIDTH * HEIGHT / 1e6)
+    base = None
+    for case, interlace, func in CASES:
+        output = subprocess.check_output([sys.executable, __file__, case])
+        peak, seconds, size = output.split()
+        peak = int(peak) / 1024.0
+        if base is None:
+            base = peak
+            continue
+        print "%-26s peak +%6.1f MB %8.2f s %8d bytes" % (
+            case, peak - base, float(seconds), int(size))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        main()
@@ -0,0 +1,90 @@
+"""Compression ratio and throughput of each Writer filter_strategy on
+the pictures in static/, each written again in its own colour type,
+straight and interlaced, and (for the slower strategies) with and
+without NumPy.
+
+The ratio is the size of the unfiltered, uncompressed scanlines over
+the size of the file; throughput counts those uncompressed bytes.
+Every file is decoded again and checked against the original pixels.
+"""
+import cStringIO as StringIO
+import glob
+import os
+
+import bench
+
+import printman.png as png
+
+STRATEGIES = [None, "dedup", "sub", "up", "average", "paeth", "adaptive"]
+
+
+def pictures():
+    """(name, Writer arguments, rows, raw size) for each picture."""
+    out = []
+    paths = sorted(glob.glob(os.path.join(bench.ROOT, "static", "*.png")))
+    for path in paths + [os.path.join(bench.ROOT, "icon.png")]:
+        width, height, pixels, info = png.Reader(filename=path).read()
+        rows = [list(row) for row in pixels]
+        kwargs = dict(width=width, height=height, bitdepth=info["bitdepth"])
+        if "palette" in info:
+            kwargs["palette"] = info["palette"]
+        else:
+            kwargs.update(greyscale=info["greyscale"], alpha=info["alpha"])
+        raw = height * (1 + (width * info["planes"] * info["bitdepth"] + 7) // 8)
+        out.append((os.path.basename(path), kwargs, rows, raw))
+    return out
+
+
+def encode(picture, strategy, interlace):
+    name, kwargs, rows, raw = picture
+    writer = png.Writer(filter_strategy=strategy, interlace=interlace, **kwargs)
+    buf = StringIO.StringIO()
+    writer.write(buf, rows)
+    return buf.getvalue()
+
+
+def check(images):
+    for picture in images:
+        for strategy in STRATEGIES:
+            for interlace in (False, True):
+                data = encode(picture, strategy, interlace)
+                decoded = [list(row) for row in png.Reader(bytes=data).read()[2]]
+                assert decoded == picture[2], (picture[0], strategy, interlace)
+
+
+def compare(images, interlace):
+    raw = sum(picture[3] for picture in images)
+    for strategy in STRATEGIES:
+        size = sum(len(encode(picture, strategy, interlace)) for picture in images)
+        seconds = bench.best_of(
+            lambda: [encode(picture, strategy, interlace) for picture in images],
+            repeat=3)
+        bench.report("%s: %d bytes, ratio %.2f" % (
+            strategy, size, raw / float(size)), seconds, raw / 1e6, "MB")
+
+
+def main():
+    images = pictures()
+    check(images)
+    groups = [
+        ("palette", [p for p in images if "palette" in p[1]]),
+        ("greyscale and colour", [p for p in images if "palette" not in p[1]]),
+    ]
+    for interlace in (False, True):
+        for name, group in groups:
+            print
+            print "%s, %s: %d pictures, %d bytes of scanlines" % (
+                name.capitalize(), "interlaced" if interlace else "straight",
+                len(group), sum(picture[3] for picture in group))
+            compare(group, interlace)
+    print
+    print "Greyscale and colour, straight, without NumPy:"
+    png.use_numpy = False
+    try:
+        compare(groups[1][1], False)
+    finally:
+        png.use_numpy = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""png.Writer at bit depth 1 and 2, with pack_samples and with the
+group()/reduce() packing it replaced.
+
+The images are the SAMPLE_GAME edition (384 pixels wide, as lists of 0
+and 1) and a game's QR code as qrcode's PngImage draws it (rows of "0"
+and "1" in array('c')).  Every image is checked to come out byte for
+byte the same both ways.
+"""
+import array
+import cStringIO as StringIO
+import math
+
+import bench
+
+import printman.board
+import printman.game as game
+import printman.png as png
+import printman.qrcode.main as qrcode
+import printman.render as render
+
+
+def group_pack(row, bitdepth):
+    """pack_samples as it was done before, one byte at a time."""
+    try:
+        a = array.array('B', row)
+    except TypeError:
+        a = array.array('B', map(int, row))
+    spb = int(8 / bitdepth)
+    l = float(len(a))
+    extra = math.ceil(l / float(spb)) * spb - l
+    a.extend([0] * int(extra))
+    l = png.group(a, spb)
+    l = map(lambda e: reduce(lambda x, y: (x << bitdepth) + y, e), l)
+    return array.array('B', l).tostring()
+
+
+def edition_rows():
+    board = game.Board.load(bench.sample_game())
+    canvas = render.draw_edition(board, bench.page_width())
+    width = canvas.width
+    return width, [[(row >> (width - 1 - x)) & 1 for x in range(width)]
+                   for row in canvas.rows]
+
+
+def qr_image():
+    qr = qrcode.QRCode(box_size=2, border=0, version=5)
+    qr.add_data("http://localhost:8080/p/?g=0123456789abcdef")
+    return qr.make_image()
+
+
+def write(width, rows, bitdepth):
+    out = StringIO.StringIO()
+    png.Writer(width=width, height=len(rows), greyscale=True,
+               bitdepth=bitdepth).write(out, rows)
+    return out.getvalue()
+
+
+def save_qr(image):
+    out = StringIO.StringIO()
+    image.save(out)
+    return out.getvalue()
+
+
+def compare(name, func):
+    fast = png.pack_samples
+    png.pack_samples = group_pack
+    try:
+        expected = func()
+        before = bench.best_of(func)
+    finally:
+        png.pack_samples = fast
+    assert func() == expected, name
+    after = bench.best_of(func)
+    bench.report("%s (group)" % name, before)
+    bench.report("%s (pack_samples)" % name, after)
+
+
+def main():
+    width, rows = edition_rows()
+    compare("edition %dx%d, 1 bit" % (width, len(rows)),
+            lambda: write(width, rows, 1))
+    grey2 = [[3 * v for v in row] for row in rows]
+    compare("edition %dx%d, 2 bit" % (width, len(rows)),
+            lambda: write(width, grey2, 2))
+    image = qr_image()
+    compare("QR %dx%d, 1 bit" % (image.pixelsize, image.pixelsize),
+            lambda: save_qr(image))
+
+
+if __name__ == "__main__":
+    main()
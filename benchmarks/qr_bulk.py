@@ -0,0 +1,64 @@
+"""Drawing the QR codes for many games on one host, as when filling in
+a SavedQR for every existing game.
+
+Every code links to http://<host>/p/?g=<id>.<secret>, so only the game
+key differs from one code to the next.  printman.qr.make_qr makes them
+with a qrcode.PrefixBuilder for the host, which is checked against
+QRCode.make and timed against it.
+"""
+import random
+import cStringIO as StringIO
+
+import bench
+
+import printman.qr
+import printman.qrcode.main as qrcode
+
+HOST = "print-man.appspot.com"
+
+
+def game_keys(count):
+    rand = random.Random(count)
+    return ["%d.%08x" % (rand.randrange(10 ** 15, 10 ** 16),
+                         rand.getrandbits(32)) for i in range(count)]
+
+
+def reference_qr(key):
+    qr = qrcode.QRCode(box_size=printman.qr.QR_BOX_SIZE, border=0,
+                       version=printman.qr.QR_VERSION)
+    qr.add_data(printman.qr.game_url(HOST, key))
+    qr.make()
+    return qr
+
+
+def backfill(keys):
+    out = []
+    for key in keys:
+        buf = StringIO.StringIO()
+        printman.qr.make_qr(HOST, key).make_image().save(buf)
+        out.append(buf.getvalue())
+    return out
+
+
+def main():
+    keys = game_keys(200)
+    keys += ["%d.%08x" % (i, i) for i in (1, 42, 12345, 10 ** 9)]
+    # Too long for version 5, so made by QRCode.make
+    keys.append("%d.%08x" % (10 ** 40, 1))
+    for key in keys:
+        qr = printman.qr.make_qr(HOST, key)
+        reference = reference_qr(key)
+        assert qr.version == reference.version, key
+        assert qr.modules == reference.modules, key
+    count = len(keys)
+    bench.report("QRCode.make", bench.best_of(
+        lambda: [reference_qr(key) for key in keys], 3), count, "codes")
+    bench.report("make_qr (PrefixBuilder)", bench.best_of(
+        lambda: [printman.qr.make_qr(HOST, key) for key in keys], 3),
+        count, "codes")
+    bench.report("backfill PNGs", bench.best_of(
+        lambda: backfill(keys), 3), count, "codes")
+
+
+if __name__ == "__main__":
+    main()
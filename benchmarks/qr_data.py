@@ -0,0 +1,124 @@
+"""Encoding game URLs into QR data codewords at version 5, with the
+bytearray BitBuffer and with the list-of-bits one it replaced.
+
+Both are checked to give the same codewords, for numeric, alphanumeric
+and 8 bit data of many lengths, as well as for the URLs.
+"""
+import math
+import random
+
+import bench
+
+import printman.qrcode.base as base
+import printman.qrcode.util as util
+
+GAMES = 500
+
+
+class ReferenceBitBuffer:
+
+    def __init__(self):
+        self.buffer = []
+        self.length = 0
+
+    def put(self, num, length):
+        for i in range(length):
+            self.put_bit(((num >> (length - i - 1)) & 1) == 1)
+
+    def __len__(self):
+        return self.length
+
+    def put_bit(self, bit):
+        buf_index = self.length // 8
+        if len(self.buffer) <= buf_index:
+            self.buffer.append(0)
+        if bit:
+            self.buffer[buf_index] |= (0x80 >> (self.length % 8))
+        self.length += 1
+
+
+def reference_write(data, buffer):
+    if data.mode == util.MODE_NUMBER:
+        for i in xrange(0, len(data.data), 3):
+            chars = data.data[i:i + 3]
+            buffer.put(int(chars), util.NUMBER_LENGTH[len(chars)])
+    elif data.mode == util.MODE_ALPHA_NUM:
+        for i in xrange(0, len(data.data), 2):
+            chars = data.data[i:i + 2]
+            if len(chars) > 1:
+                buffer.put(util.ALPHA_NUM.find(chars[0]) * 45 +
+                           util.ALPHA_NUM.find(chars[1]), 11)
+            else:
+                buffer.put(util.ALPHA_NUM.find(chars), 6)
+    else:
+        for c in data.data:
+            buffer.put(ord(c), 8)
+
+
+def reference_data_buffer(version, data_list, total_data_count):
+    buffer = ReferenceBitBuffer()
+    for data in data_list:
+        buffer.put(data.mode, 4)
+        buffer.put(len(data), util.length_in_bits(data.mode, version))
+        reference_write(data, buffer)
+    if len(buffer) + 4 <= total_data_count * 8:
+        buffer.put(0, 4)
+    while len(buffer) % 8:
+        buffer.put_bit(False)
+    while True:
+        if len(buffer) >= total_data_count * 8:
+            break
+        buffer.put(util.PAD0, 8)
+        if len(buffer) >= total_data_count * 8:
+            break
+        buffer.put(util.PAD1, 8)
+    return buffer
+
+
+def total_data_count(version, error_correction=0):
+    return sum(block.data_count
+               for block in base.rs_blocks(version, error_correction))
+
+
+def check_modes(seed=0):
+    rnd = random.Random(seed)
+    alphabets = ("0123456789", util.ALPHA_NUM,
+                 "".join(chr(i) for i in range(256)))
+    total = total_data_count(10)
+    for i in range(300):
+        data_list = []
+        for part in range(rnd.randrange(1, 4)):
+            alphabet = rnd.choice(alphabets)
+            data_list.append(util.QRData("".join(
+                rnd.choice(alphabet) for c in range(rnd.randrange(1, 40)))))
+        expected = reference_data_buffer(10, data_list, total).buffer
+        assert list(util._data_buffer(10, data_list, total).buffer) == expected
+
+
+def urls(count):
+    return ["http://print-man.appspot.com/p/?g=%032x" % (1000 + i)
+            for i in range(count)]
+
+
+def main():
+    check_modes()
+    data_lists = [[util.QRData(url)] for url in urls(GAMES)]
+    total = total_data_count(5)
+    for data_list in data_lists:
+        assert (list(util._data_buffer(5, data_list, total).buffer) ==
+                reference_data_buffer(5, data_list, total).buffer)
+    print "same codewords for all modes and the game URLs"
+
+    bench.report("data codewords (list of bits)", bench.best_of(
+        lambda: [reference_data_buffer(5, d, total) for d in data_lists]),
+        GAMES, "codes")
+    bench.report("data codewords (bytearray)", bench.best_of(
+        lambda: [util._data_buffer(5, d, total) for d in data_lists]),
+        GAMES, "codes")
+    bench.report("create_data", bench.best_of(
+        lambda: [util.create_data(5, 0, d) for d in data_lists]),
+        GAMES, "codes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Reed-Solomon codewords with qrcode.ecc against the Polynomial based
+create_bytes it replaced, for one game URL and for many.
+
+Checks that create_data gives the same codewords as before for every
+version and error correction level.
+"""
+import random
+
+import bench
+
+import printman.qrcode.base as base
+import printman.qrcode.ecc as ecc
+import printman.qrcode.util as util
+
+GAMES = 500
+
+
+def reference_create_bytes(buffer, rs_blocks):
+    offset = 0
+    maxDcCount = 0
+    maxEcCount = 0
+    dcdata = [0] * len(rs_blocks)
+    ecdata = [0] * len(rs_blocks)
+    for r in range(len(rs_blocks)):
+        dcCount = rs_blocks[r].data_count
+        ecCount = rs_blocks[r].total_count - dcCount
+        maxDcCount = max(maxDcCount, dcCount)
+        maxEcCount = max(maxEcCount, ecCount)
+        dcdata[r] = [0] * dcCount
+        for i in range(len(dcdata[r])):
+            dcdata[r][i] = 0xff & buffer.buffer[i + offset]
+        offset += dcCount
+        rsPoly = base.Polynomial([1], 0)
+        for i in range(ecCount):
+            rsPoly = rsPoly * base.Polynomial([1, base.gexp(i)], 0)
+        rawPoly = base.Polynomial(dcdata[r], len(rsPoly) - 1)
+        modPoly = rawPoly % rsPoly
+        ecdata[r] = [0] * (len(rsPoly) - 1)
+        for i in range(len(ecdata[r])):
+            modIndex = i + len(modPoly) - len(ecdata[r])
+            if (modIndex >= 0):
+                ecdata[r][i] = modPoly[modIndex]
+            else:
+                ecdata[r][i] = 0
+    totalCodeCount = 0
+    for rs_block in rs_blocks:
+        totalCodeCount += rs_block.total_count
+    data = [None] * totalCodeCount
+    index = 0
+    for i in range(maxDcCount):
+        for r in range(len(rs_blocks)):
+            if i < len(dcdata[r]):
+                data[index] = dcdata[r][i]
+                index += 1
+    for i in range(maxEcCount):
+        for r in range(len(rs_blocks)):
+            if i < len(ecdata[r]):
+                data[index] = ecdata[r][i]
+                index += 1
+    return data
+
+
+def reference_create_data(version, error_correction, data_list):
+    rs_blocks = base.rs_blocks(version, error_correction)
+    total = sum(block.data_count for block in rs_blocks)
+    buffer = util._data_buffer(version, [util.QRData(d) for d in data_list], total)
+    return reference_create_bytes(buffer, rs_blocks)
+
+
+def check_versions(seed=0):
+    rnd = random.Random(seed)
+    for version in range(1, 41):
+        for error_correction in range(4):
+            data = ["".join(chr(rnd.randrange(256))
+                            for i in range(rnd.randrange(1, 5 + version)))]
+            expected = reference_create_data(version, error_correction, data)
+            got = util.create_data(version, error_correction,
+                                   [util.QRData(d) for d in data])
+            assert list(got) == expected, (version, error_correction)
+
+
+def urls(count):
+    return ["http://print-man.appspot.com/p/?g=%032x" % (1000 + i)
+            for i in range(count)]
+
+
+def main():
+    check_versions()
+    print "create_data matches for versions 1-40, all EC levels"
+
+    data = urls(GAMES)
+    data_lists = [[util.QRData(d)] for d in data]
+    one = data_lists[0]
+    bench.report("create_data, v5 (Polynomial)", bench.best_of(
+        lambda: reference_create_data(5, 0, data[:1])), 1, "codes")
+    bench.report("create_data, v5 (ecc)", bench.best_of(
+        lambda: util.create_data(5, 0, one)), 1, "codes")
+    bench.report("create_data x%d" % GAMES, bench.best_of(
+        lambda: [util.create_data(5, 0, d) for d in data_lists]), GAMES, "codes")
+
+    # The error correction on its own: version 5-M has two blocks of 43
+    # data codewords, each with 24 error correction codewords.
+    blocks = [bytearray(util.create_data(5, 0, d)[:43]) for d in data_lists]
+    generator = base.Polynomial([1], 0)
+    for i in range(24):
+        generator = generator * base.Polynomial([1, base.gexp(i)], 0)
+    bench.report("EC codewords x%d (Polynomial)" % GAMES, bench.best_of(
+        lambda: [base.Polynomial(list(b), 24) % generator for b in blocks], 1),
+        GAMES, "blocks")
+    bench.report("EC codewords x%d (ecc.remainder)" % GAMES, bench.best_of(
+        lambda: [ecc.remainder(b, 24) for b in blocks]), GAMES, "blocks")
+
+
+if __name__ == "__main__":
+    main()
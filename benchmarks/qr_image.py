@@ -0,0 +1,69 @@
+"""Drawing a made QR code as a PNG: make_image, then save.
+
+The "per pixel" rows put back the old PngImage, which kept a list of
+array('c') rows of "1" and "0" characters, drew box_size ** 2 of them
+for each dark module, and had png.Writer pack them.
+"""
+import array
+import cStringIO as StringIO
+
+import bench
+
+import printman.png as png
+import printman.qr
+import printman.qrcode.image.base as base
+import printman.qrcode.image.png
+
+
+class LegacyPngImage(base.BaseImage):
+
+    def __init__(self, border, width, box_size):
+        super(LegacyPngImage, self).__init__(border, width, box_size)
+        self.kind = "PNG"
+        self.pixelsize = (self.width + self.border * 2) * self.box_size
+        self.pixels = [array.array("c", "1" * self.pixelsize)
+                       for a in range(self.pixelsize)]
+
+    def drawrect(self, row, col):
+        start_x = (col + self.border) * self.box_size
+        start_y = (row + self.border) * self.box_size
+        for y in range(start_y, start_y + self.box_size):
+            for x in range(start_x, start_x + self.box_size):
+                self.pixels[y][x] = "0"
+
+    def save(self, stream, kind=None):
+        writer = png.Writer(width=self.pixelsize, height=self.pixelsize,
+                            alpha=False, greyscale=True, bitdepth=1)
+        writer.write(stream, self.pixels)
+
+
+class DrawrectPngImage(printman.qrcode.image.png.PngImage):
+    """The new PngImage, drawn a module at a time."""
+    draw_modules = base.BaseImage.draw_modules.im_func
+
+
+def draw(codes, factory):
+    out = []
+    for qr in codes:
+        buf = StringIO.StringIO()
+        qr.make_image(factory).save(buf)
+        out.append(buf.getvalue())
+    return out
+
+
+def main():
+    codes = [printman.qr.make_qr("print-man.appspot.com", "%d.%08x" % (i, i))
+             for i in range(5629499534213120, 5629499534213170)]
+    expected = draw(codes, LegacyPngImage)
+    assert draw(codes, DrawrectPngImage) == expected
+    assert draw(codes, printman.qrcode.image.png.PngImage) == expected
+    count = len(codes)
+    for name, factory in (("per pixel", LegacyPngImage),
+                          ("packed, per module", DrawrectPngImage),
+                          ("packed, per row", printman.qrcode.image.png.PngImage)):
+        bench.report("make_image + save (%s)" % name, bench.best_of(
+            lambda: draw(codes, factory)), count, "codes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Building a game's QR code as QRHandler does on a cold memcache:
+make_qr, then make_image and save as PNG.
+
+The "per module" rows put back the old makeImpl, which laid out every
+function pattern and mapped the data module by module (legacy_map_data)
+for each of the eight mask trials, and scored each trial on the module
+lists.
+"""
+import cStringIO as StringIO
+
+import bench
+
+import printman.qrcode.main as qrcode
+import printman.qrcode.util as util
+
+
+def legacy_make_impl(self, test, mask_pattern):
+    self.modules_count = self.version * 4 + 17
+    self.modules = [[None] * self.modules_count
+                    for row in range(self.modules_count)]
+    self.setup_position_probe_pattern(0, 0)
+    self.setup_position_probe_pattern(self.modules_count - 7, 0)
+    self.setup_position_probe_pattern(0, self.modules_count - 7)
+    self.sutup_position_adjust_pattern()
+    self.setup_timing_pattern()
+    self.setup_type_info(test, mask_pattern)
+    if self.version >= 7:
+        self.setup_type_number(test)
+    if self.data_cache is None:
+        self.data_cache = util.create_data(
+            self.version, self.error_correction, self.data_list)
+    legacy_map_data(self, self.data_cache, mask_pattern)
+
+
+def legacy_map_data(self, data, mask_pattern):
+    """The QRCode.map_data that Template.data_cells replaced."""
+    inc = -1
+    row = self.modules_count - 1
+    bitIndex = 7
+    byteIndex = 0
+
+    mask_func = util.mask_func(mask_pattern)
+
+    for col in range(self.modules_count - 1, -1, -2):
+
+        if col == 6:
+            col -= 1
+
+        while True:
+
+            for c in range(2):
+
+                # Note that col - c looks like a dangerous range (col could
+                # be 0, causing lookup of -1). However, this isn't possible
+                # because self.modules_count is always odd so the last
+                # range item will always be 1.
+                if self.modules[row][col - c] is None:
+
+                    dark = False
+
+                    if byteIndex < len(data):
+                        dark = (((data[byteIndex] >> bitIndex) & 1) == 1)
+
+                    if mask_func(row, col - c):
+                        dark = not dark
+
+                    self.modules[row][col - c] = dark
+                    bitIndex -= 1
+
+                    if bitIndex == -1:
+                        byteIndex += 1
+                        bitIndex = 7
+
+            row += inc
+
+            if row < 0 or self.modules_count <= row:
+                row -= inc
+                inc = -inc
+                break
+
+
+def legacy_best_mask_pattern(self):
+    min_lost_point = 0
+    pattern = 0
+    for i in range(8):
+        self.makeImpl(True, i)
+        lost_point = util.lost_point(self.modules)
+        if i == 0 or min_lost_point > lost_point:
+            min_lost_point = lost_point
+            pattern = i
+    return pattern
+
+
+def game_qr(key):
+    qr = qrcode.QRCode(box_size=2, border=0, version=5)
+    qr.add_data("http://print-man.appspot.com/p/?g=%032x" % key)
+    qr.make()
+    return qr
+
+
+def handler(keys):
+    """The qr codes for `keys`, from QRHandler's cache miss path."""
+    out = []
+    for key in keys:
+        buf = StringIO.StringIO()
+        game_qr(key).make_image().save(buf)
+        out.append(buf.getvalue())
+    return out
+
+
+def main():
+    keys = range(1000, 1020)
+    patched = (("makeImpl", legacy_make_impl),
+               ("best_mask_pattern", legacy_best_mask_pattern))
+    saved = [(name, getattr(qrcode.QRCode, name)) for name, _ in patched]
+    for name, func in patched:
+        setattr(qrcode.QRCode, name, func)
+    try:
+        expected = handler(keys)
+        before = bench.best_of(lambda: handler(keys))
+        make_before = bench.best_of(lambda: [game_qr(key) for key in keys])
+    finally:
+        for name, func in saved:
+            setattr(qrcode.QRCode, name, func)
+    assert handler(keys) == expected
+    after = bench.best_of(lambda: handler(keys))
+    make_after = bench.best_of(lambda: [game_qr(key) for key in keys])
+    count = len(keys)
+    bench.report("QRCode.make (per module)", make_before, count, "codes")
+    bench.report("QRCode.make (template)", make_after, count, "codes")
+    bench.report("QRHandler miss (per module)", before, count, "codes")
+    bench.report("QRHandler miss (template)", after, count, "codes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""qrcode.util.lost_point against the module-by-module version it
+replaced, and the row-at-a-time version that came between, for scores
+and for speed.
+
+Scores are checked on random matrices of every size from version 1 to
+40 (at a few dark module densities, so every penalty comes up), and on
+the eight masked candidates of a real symbol.
+"""
+import random
+
+import bench
+
+import printman.qrcode.main as qrcode
+import printman.qrcode.util as util
+
+
+def reference_lost_point(modules):
+    modules_count = len(modules)
+    lost_point = 0
+    for row in range(modules_count):
+        for col in range(modules_count):
+            sameCount = 0
+            dark = modules[row][col]
+            for r in range(-1, 2):
+                if row + r < 0 or modules_count <= row + r:
+                    continue
+                for c in range(-1, 2):
+                    if col + c < 0 or modules_count <= col + c:
+                        continue
+                    if r == 0 and c == 0:
+                        continue
+                    if dark == modules[row + r][col + c]:
+                        sameCount += 1
+            if sameCount > 5:
+                lost_point += (3 + sameCount - 5)
+    for row in range(modules_count - 1):
+        for col in range(modules_count - 1):
+            count = 0
+            if modules[row][col]:
+                count += 1
+            if modules[row + 1][col]:
+                count += 1
+            if modules[row][col + 1]:
+                count += 1
+            if modules[row + 1][col + 1]:
+                count += 1
+            if count == 0 or count == 4:
+                lost_point += 3
+    for row in range(modules_count):
+        for col in range(modules_count - 6):
+            if (modules[row][col]
+                    and not modules[row][col + 1]
+                    and modules[row][col + 2]
+                    and modules[row][col + 3]
+                    and modules[row][col + 4]
+                    and not modules[row][col + 5]
+                    and modules[row][col + 6]):
+                lost_point += 40
+    for col in range(modules_count):
+        for row in range(modules_count - 6):
+            if (modules[row][col]
+                    and not modules[row + 1][col]
+                    and modules[row + 2][col]
+                    and modules[row + 3][col]
+                    and modules[row + 4][col]
+                    and not modules[row + 5][col]
+                    and modules[row + 6][col]):
+                lost_point += 40
+    darkCount = 0
+    for col in range(modules_count):
+        for row in range(modules_count):
+            if modules[row][col]:
+                darkCount += 1
+    ratio = abs(100 * darkCount / modules_count / modules_count - 50) / 5
+    lost_point += ratio * 10
+    return lost_point
+
+
+def row_lost_point_rows(rows, modules_count):
+    """
+    The mask penalty score of a symbol given as one int per row of
+    modules (see ``row_bits``).
+
+    Each penalty is worked out for a whole row at a time with bitwise
+    operations, rather than module by module.
+    """
+    full = (1 << modules_count) - 1
+    # Columns that have a neighbour to their right, and to their left
+    has_right = full >> 1
+    has_left = full & ~1
+
+    lost_point = 0
+
+    # LEVEL1: modules with more than five of their (up to eight)
+    # neighbours the same colour as themselves.  For each row, the
+    # neighbours that match are added up column-wise in a 4 bit counter
+    # held as four ints (s0 being the ones bit of every column).
+
+    for row in range(modules_count):
+        dark = rows[row]
+        s0 = s1 = s2 = s3 = 0
+        for r in range(max(row - 1, 0), min(row + 2, modules_count)):
+            other = rows[r]
+            if r == row:
+                neighbours = ((other >> 1, has_right), (other << 1, has_left))
+            else:
+                neighbours = ((other, full), (other >> 1, has_right),
+                              (other << 1, has_left))
+            for bits, valid in neighbours:
+                carry = ~(dark ^ bits) & valid
+                s0, carry = s0 ^ carry, s0 & carry
+                s1, carry = s1 ^ carry, s1 & carry
+                s2, carry = s2 ^ carry, s2 & carry
+                s3 |= carry
+        # Same count of 6, 7 or 8, which scores (3 + same count - 5)
+        over = s3 | (s2 & s1)
+        if over:
+            lost_point += (util.popcount(s0 & over) + 2 * util.popcount(s1 & over) +
+                           4 * util.popcount(s2 & over) + 8 * util.popcount(s3 & over) -
+                           2 * util.popcount(over))
+
+    # LEVEL2: 2x2 blocks of one colour.
+
+    for row in range(modules_count - 1):
+        top, bottom = rows[row], rows[row + 1]
+        dark = top & (top >> 1) & bottom & (bottom >> 1)
+        light = ~(top | (top >> 1) | bottom | (bottom >> 1))
+        lost_point += 3 * util.popcount((dark | light) & has_right)
+
+    # LEVEL3: 1:1:3:1:1 dark:light:dark:light:dark runs, across and
+    # down.
+
+    starts = full >> 6
+    for row in range(modules_count):
+        dark = rows[row]
+        found = (dark & ~(dark >> 1) & (dark >> 2) & (dark >> 3) &
+                 (dark >> 4) & ~(dark >> 5) & (dark >> 6) & starts)
+        if found:
+            lost_point += 40 * util.popcount(found)
+
+    for row in range(modules_count - 6):
+        found = (rows[row] & ~rows[row + 1] & rows[row + 2] & rows[row + 3] &
+                 rows[row + 4] & ~rows[row + 5] & rows[row + 6])
+        if found:
+            lost_point += 40 * util.popcount(found)
+
+    # LEVEL4
+
+    darkCount = sum(util.popcount(dark) for dark in rows)
+
+    ratio = abs(100 * darkCount // modules_count // modules_count - 50) // 5
+    lost_point += ratio * 10
+
+    return lost_point
+
+
+def row_lost_point(modules):
+    return row_lost_point_rows([util.row_bits(row) for row in modules],
+                               len(modules))
+
+
+def check_random(seed=0, per_size=3):
+    rnd = random.Random(seed)
+    checked = 0
+    for version in range(1, 41):
+        size = version * 4 + 17
+        for density in (0.1, 0.5, 0.9)[:per_size]:
+            modules = [[rnd.random() < density for c in range(size)]
+                       for r in range(size)]
+            expected = reference_lost_point(modules)
+            got = util.lost_point(modules)
+            assert got == expected, (version, density, got, expected)
+            assert row_lost_point(modules) == expected, (version, density)
+            checked += 1
+    return checked
+
+
+def make_qr():
+    qr = qrcode.QRCode(box_size=2, border=0, version=5)
+    qr.add_data("http://localhost:8080/p/?g=0123456789abcdef")
+    qr.best_fit(start=qr.version)
+    return qr
+
+
+def check_symbol(qr):
+    for pattern in range(8):
+        qr.makeImpl(True, pattern)
+        assert util.lost_point(qr.modules) == reference_lost_point(qr.modules)
+
+
+def main():
+    print "%d random matrices, versions 1-40: same scores" % check_random()
+    qr = make_qr()
+    check_symbol(qr)
+    print "version %d symbol, all 8 masks: same scores" % qr.version
+
+    modules = qr.modules
+    bench.report("lost_point (per module)",
+                 bench.best_of(lambda: reference_lost_point(modules)))
+    bench.report("lost_point (per row)",
+                 bench.best_of(lambda: row_lost_point(modules)))
+    bench.report("lost_point (whole symbol)",
+                 bench.best_of(lambda: util.lost_point(modules)))
+
+    candidates = []
+    for pattern in range(8):
+        qr.makeImpl(True, pattern)
+        candidates.append(qr.modules)
+    bench.report("8 mask trials (per module)", bench.best_of(
+        lambda: [reference_lost_point(m) for m in candidates]))
+    bench.report("8 mask trials (per row)", bench.best_of(
+        lambda: [row_lost_point(m) for m in candidates]))
+    bench.report("8 mask trials (whole symbol)", bench.best_of(
+        lambda: [util.lost_point(m) for m in candidates]))
+
+if __name__ == "__main__":
+    main()
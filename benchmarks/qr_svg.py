@@ -0,0 +1,89 @@
+"""Drawing QR codes as SVG.
+
+The "per module" rows put back the old SvgImage, which built an
+ElementTree with a rect for every dark module and then serialized it
+(with its missing qrcode import fixed).  The new images merge each run
+of dark modules into one rect, or into a single path, and write the
+text straight out.
+"""
+import re
+import cStringIO as StringIO
+import xml.etree.ElementTree as ET
+
+import bench
+
+import printman.qr
+import printman.qrcode.image.base as base
+import printman.qrcode.image.svg as svg
+
+
+class LegacySvgImage(base.BaseImage):
+
+    _SVG_namespace = "http://www.w3.org/2000/svg"
+
+    def __init__(self, border, width, box_size):
+        super(LegacySvgImage, self).__init__(border, width, box_size)
+        self.kind = "SVG"
+        dimension = "%dmm" % (2 * self.border + self.width)
+        self._img = ET.Element("svg", version="1.1",
+                               width=dimension, height=dimension)
+        self._img.set("xmlns", self._SVG_namespace)
+
+    def drawrect(self, row, col):
+        self._img.append(ET.Element("rect",
+                                    x="%dmm" % (self.border + col),
+                                    y="%dmm" % (self.border + row),
+                                    width="1mm", height="1mm"))
+
+    def save(self, stream, kind=None):
+        ET.ElementTree(self._img).write(stream, encoding="UTF-8",
+                                        xml_declaration=True)
+
+
+def dark_modules(text):
+    """The (x, y) of every module an SVG from these images covers."""
+    cells = set()
+    root = ET.fromstring(text)
+    for element in root.iter():
+        tag = element.tag.split("}")[-1]
+        if tag == "rect":
+            x, y, width = [int(element.get(name)[:-2])
+                           for name in ("x", "y", "width")]
+            cells.update((x + i, y) for i in range(width))
+        elif tag == "path":
+            for x, y, width in re.findall(r"M(\d+) (\d+)h(\d+)",
+                                          element.get("d")):
+                cells.update((int(x) + i, int(y)) for i in range(int(width)))
+    return cells
+
+
+def draw(codes, factory):
+    out = []
+    for qr in codes:
+        buf = StringIO.StringIO()
+        qr.make_image(factory).save(buf)
+        out.append(buf.getvalue())
+    return out
+
+
+def main():
+    codes = [printman.qr.make_qr("print-man.appspot.com", "%d.%08x" % (i, i))
+             for i in range(5629499534213120, 5629499534213170)]
+    for qr in codes:
+        qr.border = 4
+    expected = [dark_modules(text) for text in draw(codes, LegacySvgImage)]
+    factories = (("per module", LegacySvgImage),
+                 ("fragment, runs", svg.SvgFragmentImage),
+                 ("rects, runs", svg.SvgImage),
+                 ("path", svg.SvgPathImage))
+    count = len(codes)
+    for name, factory in factories:
+        out = draw(codes, factory)
+        assert [dark_modules(text) for text in out] == expected, name
+        size = sum(len(text) for text in out) // count
+        bench.report("%s (%d bytes)" % (name, size), bench.best_of(
+            lambda: draw(codes, factory)), count, "codes")
+
+
+if __name__ == "__main__":
+    main()
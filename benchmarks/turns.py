@@ -0,0 +1,107 @@
+"""Turns per second on ClassicBoard, with game.closest and closest_cell.
+
+The "sorted" rows swap the pre-closest_cell move selection back in: it
+built a list of (x, y) options and took the head of game.closest's
+sorted list of (distance, option) pairs.
+"""
+import random
+
+import bench
+
+import printman.board
+import printman.game as game
+
+GAMES = 200
+TURNS = 300
+
+
+def sorted_closest_option(self, target):
+    coords = self.board.COORDS
+    behind = self.get_behind()
+    options = [coords[o] for o in self.board.NEIGHBOURS[self.cell] if o != behind]
+    return self.board.cell_id(*game.closest(target, *options))
+
+
+def sorted_move_simple(self):
+    board = self.board
+    cell = self.cell
+    if board.ROOM_BITS[cell >> 3] & (1 << (cell & 7)):
+        target = board.COORDS[board.EXIT_TARGETS[cell]]
+        options = [board.COORDS[o] for o in board.ROOM_OPTIONS[cell]]
+        self.set_pos(board.cell_id(*game.closest(target, *options)))
+        return True
+    return fast_move_simple(self)
+
+
+fast_closest_option = game.Monster.closest_option
+fast_move_simple = game.Monster.move_simple
+
+
+def make_moves():
+    rnd = random.Random(0)
+    return [[rnd.randrange(4) if rnd.random() < 0.3 else None
+             for t in range(TURNS)] for g in range(GAMES)]
+
+
+def play(moves):
+    turns = 0
+    for game_moves in moves:
+        board = printman.board.ClassicBoard()
+        board.dirn = game.UP
+        for dirn in game_moves:
+            if board.mode not in (game.NOT_STARTED, game.STARTED):
+                break
+            if dirn is not None:
+                board.dirn = dirn
+            board.do_turn()
+            turns += 1
+    return turns
+
+
+def collect_choices(moves):
+    """The (target, options, behind) of every closest_option call."""
+    calls = []
+
+    def record(self, target):
+        calls.append((target, self.board.NEIGHBOURS[self.cell], self.get_behind()))
+        return fast_closest_option(self, target)
+    game.Monster.closest_option = record
+    try:
+        play(moves)
+    finally:
+        game.Monster.closest_option = fast_closest_option
+    return calls
+
+
+def main():
+    moves = make_moves()
+    turns = play(moves)
+    cls = printman.board.ClassicBoard
+    coords = cls.COORDS
+
+    calls = collect_choices(moves)
+
+    def select_sorted():
+        for target, options, behind in calls:
+            game.closest(target, *[coords[o] for o in options if o != behind])
+
+    def select_linear():
+        for (x, y), options, behind in calls:
+            game.closest_cell(coords, x, y, options, behind)
+
+    report = bench.report
+    report("select: game.closest (sorted)", bench.best_of(select_sorted), len(calls), "calls")
+    report("select: game.closest_cell (linear)", bench.best_of(select_linear), len(calls), "calls")
+
+    game.Monster.closest_option = sorted_closest_option
+    game.Monster.move_simple = sorted_move_simple
+    try:
+        report("ClassicBoard turns (sorted)", bench.best_of(lambda: play(moves)), turns, "turns")
+    finally:
+        game.Monster.closest_option = fast_closest_option
+        game.Monster.move_simple = fast_move_simple
+    report("ClassicBoard turns (linear)", bench.best_of(lambda: play(moves)), turns, "turns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Check store.turns_due against the loop get_game used to step through
+missed days with, and time the two.
+
+store.py is read without importing it, as it needs the App Engine SDK.
+"""
+import ast
+import datetime
+import os
+import random
+
+import bench
+
+
+def load_turns_due():
+    """store.TURN_TIME, _microseconds and turns_due, taken from the source."""
+    with open(os.path.join(bench.ROOT, "printman", "store.py")) as fh:
+        tree = ast.parse(fh.read())
+    names = ("TURN_TIME", "_microseconds", "turns_due")
+    body = [node for node in tree.body
+            if (isinstance(node, ast.FunctionDef) and node.name in names) or
+            (isinstance(node, ast.Assign) and
+             getattr(node.targets[0], "id", None) in names)]
+    namespace = {"datetime": datetime}
+    exec compile(ast.Module(body=body), "store.py", "exec") in namespace
+    return namespace["turns_due"], namespace["TURN_TIME"]
+
+
+turns_due, TURN_TIME = load_turns_due()
+
+
+def loop_turns_due(last_turn_time, now):
+    """The turns the old get_game loop played."""
+    turns = 0
+    while last_turn_time + TURN_TIME < now:
+        turns += 1
+        last_turn_time += TURN_TIME
+    return turns
+
+
+def main():
+    last = datetime.datetime(2013, 1, 1, 8, 0, 0)
+    hour = datetime.timedelta(hours=1)
+    tick = datetime.timedelta(microseconds=1)
+    gaps = [datetime.timedelta(0), tick, -hour]
+    for hours in (1, 23, 24, 25, 36, 48, 49, 72):
+        gaps.extend([hours * hour - tick, hours * hour, hours * hour + tick])
+    rnd = random.Random(0)
+    gaps.extend(datetime.timedelta(seconds=rnd.randrange(-86400, 86400 * 400),
+                                   microseconds=rnd.randrange(1000000))
+                for i in range(2000))
+    for gap in gaps:
+        assert turns_due(last, last + gap) == loop_turns_due(last, last + gap), gap
+    print "turns_due agrees with the loop on %d gaps" % len(gaps)
+
+    long_gaps = [last + datetime.timedelta(days=d, hours=3) for d in range(0, 400, 7)]
+    bench.report("loop", bench.best_of(
+        lambda: [loop_turns_due(last, now) for now in long_gaps]), len(long_gaps), "games")
+    bench.report("turns_due", bench.best_of(
+        lambda: [turns_due(last, now) for now in long_gaps]), len(long_gaps), "games")
+
+
+if __name__ == "__main__":
+    main()
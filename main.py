@@ -3,15 +3,15 @@
 import webapp2
 import binascii
 import hashlib
+import json
 import os
 import jinja2
-import cStringIO as StringIO
 
-from google.appengine.api import memcache
-
-import printman.qrcode.main as qrcode
+import printman.assets
 import printman.board
 import printman.game
+import printman.qr
+import printman.render
 import printman.store
 
 
@@ -64,6 +64,7 @@ class Page(webapp2.RequestHandler):
             "str": str,
             "host": host,
             "controls": False,
+            "page_width": PAGE_WIDTH,
         }
         args.update(extra)
         return self.render_template("draw.html", **args)
@@ -101,7 +102,8 @@ class StartHandler(Page):
         key = self.request.get("key", None)
         assert game_type and rurl
 
-        game_key = printman.store.new_game(game_type, key=key)
+        host = self.request.environ["HTTP_HOST"]
+        game_key = printman.store.new_game(game_type, key=key, host=host)
         return self.redirect(str("%s?config[access_token]=%s" % (rurl, game_key)))
 
 
@@ -130,26 +132,62 @@ class DummyGameHandler(Page):
         return self.render_board(game, key=game_key, controls=True)
 
 
+class EditionImageHandler(Page):
+
+    def get(self):
+        game_key = self.request.get("access_token", None)
+        if game_key is None:
+            self.abort(400, "Access token not supplied")
+        game = printman.store.get_game(game_key, update=True)
+        qr_data = printman.store.get_qr_png(game_key, self.request.environ["HTTP_HOST"])
+        canvas = printman.render.render_edition(
+            game_key, game, PAGE_WIDTH,
+            qr=printman.render.Sprite.from_png(data=qr_data))
+        self.response.headers["Content-type"] = "image/png"
+        self.response.headers['ETag'] = hashlib.sha224("%s.%s.png" % (game_key, game.turn)).hexdigest()
+        canvas.write(self.response.out)
+
+
 class QRHandler(Page):
 
     def get(self):
         game_key = self.request.get("access_token")
         assert len(game_key) > 0
-        qr_data = memcache.get('%s:qrcode' % game_key)
-        if qr_data is None:
-            qr = qrcode.QRCode(box_size=2, border=0, version=5)
-            host = self.request.environ["HTTP_HOST"]
-            qr.add_data("http://%s/p/?g=%s" % (host, game_key))
-            qr.make()
-            im = qr.make_image()
-            buf = StringIO.StringIO()
-            im.save(buf)
-            qr_data = buf.getvalue()
-            memcache.add("%s:qrcode" % game_key, qr_data)
+        host = self.request.environ["HTTP_HOST"]
+        qr_data = printman.store.get_qr_png(game_key, host)
         self.response.headers["Content-type"] = "image/png"
         self.response.out.write(qr_data)
 
 
+class QRStatsHandler(Page):
+
+    def get(self):
+        self.response.headers["Content-type"] = "application/json"
+        self.response.out.write(json.dumps(printman.qr.STATS.snapshot()))
+
+
+class AssetHandler(Page):
+
+    def get(self, board_name, page_width, name):
+        # Only the width the app draws editions at, so that requests
+        # for other widths can't each have a board drawn and kept.
+        if int(page_width) != PAGE_WIDTH:
+            self.abort(404)
+        try:
+            board_cls = printman.game.Board.board_by_name(board_name)
+            asset = printman.assets.get(board_cls, int(page_width), name)
+        except (KeyError, ValueError):
+            self.abort(404)
+        # The same URL always gives the same picture for a deployment
+        self.response.headers["Cache-Control"] = "public, max-age=86400"
+        self.response.etag = asset.etag
+        if asset.etag in self.request.if_none_match:
+            self.response.status = 304
+            return
+        self.response.headers["Content-type"] = "image/png"
+        self.response.out.write(asset.data)
+
+
 class SampleHandler(Page):
 
     # This is kinda ugly, but works..
@@ -184,7 +222,9 @@ class NextHandler(Page):
 
 app = webapp2.WSGIApplication([
     ('/configure/', NewGameHandler),
+    (r'/assets/(\w+)/(\d+)/([\w.]+)\.png', AssetHandler),
     ('/edition/', EditionHandler),
+    ('/edition.png', EditionImageHandler),
     
     ('/dummy/', DummyGameHandler),
     ('/next/', NextHandler),
@@ -192,6 +232,7 @@ app = webapp2.WSGIApplication([
     ('/p/', PlayHandler),
     ('/set_dirn/', SetDirnHandler),
     ('/qr/', QRHandler),
+    ('/qr/stats/', QRStatsHandler),
     ('/sample/', SampleHandler),
     ('/start_game/', StartHandler),
     ('/started/', StartedHandler),
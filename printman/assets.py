@@ -0,0 +1,237 @@
+"""Board graphics drawn by gfx.py when they're first asked for.
+
+The pictures for a board depend only on its layout, the width of the
+page it is drawn for, and the drawing code, so each is kept under a
+name made from a hash of those: in process, and as a file in CACHE_DIR
+that outlives the process (where the filesystem can be written to).
+Adding a board or changing the page width needs no new files in gfx/.
+
+The pill, pacman and monster sprites for a cell size are drawn together
+into a SpriteAtlas, which the edition renderer blits from directly and
+the sprite PNGs are cut from.
+"""
+import hashlib
+import inspect
+import os
+import struct
+import tempfile
+import zlib
+
+import game
+import gfx
+import png
+import qr
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "printman-assets")
+
+# Cells smaller than this leave no room for the monsters' eyes
+MIN_CELL_SIZE = 8
+MAX_PAGE_WIDTH = 2048
+
+# Total size of the pictures and atlases kept in process.  A board's
+# pictures come to about 2KB of PNG data at a 384 pixel page width, and
+# an atlas to under 1KB.
+CACHE_BYTES = 256 * 1024
+ATLAS_CACHE_BYTES = 64 * 1024
+
+SPRITES = {
+	"pacman": gfx.pacman,
+	"monster": gfx.monster,
+}
+SPRITE_NAMES = ("pill",) + tuple(
+	"%s.%s" % (kind, game.DIRN_NAMES[dirn])
+	for kind in ("pacman", "monster")
+	for dirn in (game.LEFT, game.RIGHT, game.UP, game.DOWN))
+
+# Changes to the drawing code give every asset a new name
+GFX_DIGEST = hashlib.sha1(inspect.getsource(gfx)).hexdigest()
+
+
+class Asset(object):
+	"""A picture as PNG data, with the hash of the data as its ETag."""
+
+	__slots__ = ("data", "etag")
+
+	def __init__(self, data):
+		self.data = data
+		self.etag = hashlib.sha1(data).hexdigest()
+
+
+def asset_key(board_cls, page_width, name):
+	parts = [GFX_DIGEST, board_cls.__name__, str(page_width), name]
+	parts.extend(board_cls.BOARD)
+	return hashlib.sha1("\n".join(parts)).hexdigest()
+
+
+def cell_size(board_cls, page_width):
+	return page_width // board_cls.WIDTH
+
+
+class SpriteAtlas(object):
+	"""Every sprite for one cell size, as (rows, mask) lists of ints.
+
+	Rows are as render.Canvas keeps them: one int per row of pixels,
+	the most significant bit as the leftmost pixel, set bits for white.
+	"""
+
+	__slots__ = ("size", "sprites")
+
+	MAGIC = "PMSA\x02"
+	# cell size, number of sprites
+	HEADER = struct.Struct("!HB")
+
+	def __init__(self, size, sprites):
+		self.size = size
+		self.sprites = sprites
+
+	def nbytes(self):
+		"""The size of the atlas's rows, packed."""
+		return len(self.sprites) * self.size * ((self.size + 7) // 8)
+
+	@classmethod
+	def draw(cls, size):
+		full = [(1 << size) - 1] * size
+		sprites = {}
+		for name in SPRITE_NAMES:
+			kind, _, dirn = name.partition(".")
+			if kind == "pill":
+				pixels = gfx.pill(size)
+			else:
+				pixels = SPRITES[kind](size, game.DIRN_IDS[dirn])
+			rows = [int("".join("1" if c else "0" for c in row), 2) for row in pixels]
+			sprites[name] = (rows, full)
+		return cls(size, sprites)
+
+	def dumps(self):
+		"""The atlas as a string, for loads.
+
+		Each sprite is its name and its packed rows; all but the header
+		is compressed.  Masks aren't kept, as draw always sets every
+		pixel.
+		"""
+		parts = []
+		for name in sorted(self.sprites):
+			rows, _ = self.sprites[name]
+			parts.append(chr(len(name)) + name)
+			parts.extend(png.pack_rows(rows, self.size))
+		return (self.MAGIC + self.HEADER.pack(self.size, len(self.sprites)) +
+				zlib.compress("".join(parts), 9))
+
+	@classmethod
+	def loads(cls, data):
+		"""An atlas from dumps, or None if `data` isn't one."""
+		if not data.startswith(cls.MAGIC):
+			return None
+		offset = len(cls.MAGIC)
+		size, count = cls.HEADER.unpack_from(data, offset)
+		atlas = cls(size, {})
+		try:
+			body = zlib.decompress(data[offset + cls.HEADER.size:])
+		except zlib.error:
+			return None
+		width = (size + 7) // 8
+		full = [(1 << size) - 1] * size
+		pos = 0
+		for i in range(count):
+			name_length = ord(body[pos])
+			name = body[pos + 1:pos + 1 + name_length]
+			pos += 1 + name_length
+			rows = png.unpack_rows(
+				[body[j:j + width] for j in range(pos, pos + width * size, width)],
+				size)
+			pos += width * size
+			atlas.sprites[name] = (rows, full)
+		return atlas
+
+	def png(self, name):
+		"""The sprite called `name` as PNG data, as gfx.main saves it."""
+		rows, mask = self.sprites[name]
+		return gfx.encode_packed(rows, self.size, self.size)
+
+
+def _check_size(board_cls, page_width):
+	board_cls.setup()
+	size = cell_size(board_cls, page_width)
+	if page_width > MAX_PAGE_WIDTH:
+		raise ValueError("Pages are at most %d pixels wide" % MAX_PAGE_WIDTH)
+	if size < MIN_CELL_SIZE:
+		raise ValueError("%s cells would only be %d pixels wide" % (
+			board_cls.__name__, size))
+	return size
+
+
+def draw(board_cls, page_width, name):
+	"""Draw the picture called `name` (as in gfx/<Board>/) as PNG data.
+
+	Raises KeyError for a name gfx.py doesn't draw, and ValueError if the
+	page is too narrow for the board, or wider than MAX_PAGE_WIDTH.
+	"""
+	_check_size(board_cls, page_width)
+	if name == "board":
+		width, height, bits = gfx.board_bits(board_cls, page_width)
+		return gfx.encode_packed(bits, width, height)
+	if name not in SPRITE_NAMES:
+		raise KeyError("No picture called '%s'" % name)
+	return atlas(board_cls, page_width).png(name)
+
+
+def _cache_path(key, ext="png"):
+	return os.path.join(CACHE_DIR, key[:2], "%s.%s" % (key, ext))
+
+
+def _load(key, ext="png"):
+	try:
+		with open(_cache_path(key, ext), "rb") as fh:
+			return fh.read()
+	except IOError:
+		return None
+
+
+def _save(key, data, ext="png"):
+	"""Write to the cache dir.  Fails quietly on a read-only filesystem."""
+	path = _cache_path(key, ext)
+	try:
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		# Written under another name first, so that no other process
+		# reads a part written file.
+		partial = "%s.%d.tmp" % (path, os.getpid())
+		with open(partial, "wb") as fh:
+			fh.write(data)
+		os.rename(partial, path)
+	except (IOError, OSError):
+		pass
+
+
+_assets = qr.PngCache(CACHE_BYTES, lambda asset: len(asset.data))
+_atlases = qr.PngCache(ATLAS_CACHE_BYTES, SpriteAtlas.nbytes)
+
+
+def atlas(board_cls, page_width):
+	"""The SpriteAtlas for `board_cls`'s cells on a page `page_width` wide."""
+	size = _check_size(board_cls, page_width)
+	sprites = _atlases.get(size)
+	if sprites is None:
+		key = hashlib.sha1("%s\natlas\n%d" % (GFX_DIGEST, size)).hexdigest()
+		data = _load(key, "atlas")
+		sprites = data and SpriteAtlas.loads(data)
+		if sprites is None:
+			sprites = SpriteAtlas.draw(size)
+			_save(key, sprites.dumps(), "atlas")
+		_atlases.put(size, sprites)
+	return sprites
+
+
+def get(board_cls, page_width, name):
+	"""The Asset for picture `name` of `board_cls`, drawing it if needed."""
+	board_cls.setup()
+	key = asset_key(board_cls, page_width, name)
+	asset = _assets.get(key)
+	if asset is None:
+		data = _load(key)
+		if data is None:
+			data = draw(board_cls, page_width, name)
+			_save(key, data)
+		asset = Asset(data)
+		_assets.put(key, asset)
+	return asset
@@ -2,6 +2,8 @@ import game
 
 
 class PracticeBoard(game.Board):
+	__slots__ = ()
+	ID = 1
 	BOARD = """
 +++----------+++
 |++....|     ++|
@@ -15,6 +17,8 @@ class PracticeBoard(game.Board):
 	}
 
 class SmallBoard(game.Board):
+	__slots__ = ()
+	ID = 2
 	BOARD = """
 +------------------+
 |....++|M^^N|++....|
@@ -30,6 +34,8 @@ class SmallBoard(game.Board):
 
 
 class MediumBoard(game.Board):
+	__slots__ = ()
+	ID = 3
 	BOARD = """
 +----+--------+----+
 |....|........|....|
@@ -51,6 +57,8 @@ class MediumBoard(game.Board):
 
 
 class ClassicBoard(game.Board):
+	__slots__ = ()
+	ID = 4
 	BOARD = """
 +------------++------------+
 |............||............|
@@ -1,8 +1,13 @@
 import os
+import array
 import base64
+import bisect
 import cPickle as pickle
+import hashlib
+import struct
 import sys
 import collections
+import zlib
 
 
 def get_distance_cmp((x1, y1), (x2, y2)):
@@ -15,6 +20,26 @@ def closest(to, *options):
 	return pos
 
 
+def closest_cell(coords, to_x, to_y, options, exclude=-1):
+	"""Like closest, but for cell ids, and without building anything.
+
+	`coords` maps cell ids to (x, y); `options` is a sequence of cell ids,
+	of which `exclude` is skipped.  Ties go to the smallest (x, y), just
+	as closest's sort would have it.
+	"""
+	best = -1
+	for cell in options:
+		if cell == exclude:
+			continue
+		x, y = coords[cell]
+		dist = (x - to_x) * (x - to_x) + (y - to_y) * (y - to_y)
+		if (best < 0 or dist < best_dist or
+				(dist == best_dist and (x < best_x or (x == best_x and y < best_y)))):
+			best, best_dist, best_x, best_y = cell, dist, x, y
+	assert best >= 0
+	return best
+
+
 LEFT = 0
 RIGHT = 1
 UP = 2
@@ -27,6 +52,20 @@ DIRN_NAMES={
 	DOWN: "down"
 }
 
+OPPOSITE = {
+	LEFT: RIGHT,
+	RIGHT: LEFT,
+	UP: DOWN,
+	DOWN: UP,
+}
+
+DIRN_DELTAS = {
+	LEFT: (-1, 0),
+	RIGHT: (1, 0),
+	UP: (0, -1),
+	DOWN: (0, 1),
+}
+
 DIRN_IDS={
 	"left": LEFT,
 	"right": RIGHT,
@@ -35,13 +74,71 @@ DIRN_IDS={
 }
 
 
+def bitset(size, cells=()):
+	"""A packed bitset of `size` bits as a bytearray, with `cells` set."""
+	bits = bytearray((size + 7) >> 3)
+	for cell in cells:
+		bits[cell >> 3] |= 1 << (cell & 7)
+	return bits
+
+
+ROUTES_DIR = os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gfx")
+ROUTES_MAGIC = "PMRT\x01"
+NO_ROUTE = 255
+
+
+def load_routes(path, digest, count):
+	"""Read a next-hop table saved by save_routes, or None if it's stale."""
+	try:
+		with open(path, "rb") as fh:
+			data = fh.read()
+	except IOError:
+		return None
+	header = ROUTES_MAGIC + digest
+	if not data.startswith(header):
+		return None
+	table = array.array("B", zlib.decompress(data[len(header):]))
+	if len(table) != count * count:
+		return None
+	return table
+
+
+def save_routes(path, digest, table):
+	"""Cache a next-hop table.  Fails quietly on a read-only filesystem."""
+	try:
+		with open(path, "wb") as fh:
+			fh.write(ROUTES_MAGIC + digest + zlib.compress(table.tostring(), 9))
+	except (IOError, OSError):
+		pass
+
+
 NOT_STARTED = 0
 STARTED = 1
 GAME_OVER = 2
 WON = 3
 
+# Binary save format.  Older saves are pickles, which start with the
+# MARK opcode ("(", for the saved tuple) or, from protocol 2 on, PROTO.
+SAVE_VERSION = 1
+PICKLE_OPCODES = "(\x80"
+# version, board id, mode, turn, score, dirn, x, y, number of monsters
+SAVE_HEADER = struct.Struct("!BBBIIBBBB")
+# type, x, y, dirn, mode id, mode_time
+SAVE_MONSTER = struct.Struct("!cBBBBi")
+
+MONSTER_MODE_IDS = {
+	"sleep": 0,
+	"fixed": 1,
+	"chase": 2,
+	"hunt": 3,
+}
+MONSTER_MODE_NAMES = {v: k for k, v in MONSTER_MODE_IDS.iteritems()}
+
 class Monster(object):
 
+	__slots__ = ("type", "board", "cell", "dirn", "mode", "mode_time")
+
 	SLEEP_TIMES = {
 		"M": 0,
 		"N": 3,
@@ -62,19 +159,54 @@ class Monster(object):
 		"P": 2
 	}
 
+	IS_SETUP = False
+
+	@classmethod
+	def setup(cls):
+		"""Compile MODES into cumulative schedules for mode_at.
+
+		SCHEDULE_ENDS[type][i] is the number of turns, counted from the
+		start of a cycle, at which mode i runs out, so the last entry is
+		the length of the whole cycle (PERIODS[type]).
+		"""
+		if cls.IS_SETUP:
+			return
+		cls.SCHEDULE_ENDS = {}
+		cls.SCHEDULE_MODES = {}
+		cls.PERIODS = {}
+		for type, modes in cls.MODES.iteritems():
+			ends = []
+			total = 0
+			for _, time in modes:
+				total += time
+				ends.append(total)
+			cls.SCHEDULE_ENDS[type] = tuple(ends)
+			cls.SCHEDULE_MODES[type] = tuple(name for name, _ in modes)
+			cls.PERIODS[type] = total
+		cls.IS_SETUP = True
+
+	@classmethod
+	def mode_at(cls, type, turn):
+		"""The (mode, mode_time) a monster of `type` picks up at `turn`.
+
+		That is, what set_mode gives a monster whose previous mode has
+		just run out.  Before the monster's first wake-up turn this is the
+		first mode, stretched by however long it has still to sleep.
+		"""
+		remaining = turn - cls.SLEEP_TIMES[type]
+		if remaining > 0:
+			remaining = (remaining - 1) % cls.PERIODS[type] + 1
+		ends = cls.SCHEDULE_ENDS[type]
+		i = bisect.bisect_left(ends, remaining)
+		return cls.SCHEDULE_MODES[type][i], ends[i] - remaining
+
 	def __init__(self, board, type, x, y):
 		self.type = type
 		self.board = board
-		self.x = x
-		self.y = y
+		self.cell = board.cell_id(x, y)
 		self.dirn = UP
 		self.mode = None
 		self.mode_time = 0
-		self.mode_names = {
-			"fixed": self.do_goto_fixed,
-			"chase": self.do_chase,
-			"sleep": self.do_sleep
-		}
 		self.set_mode()
 
 	def dump(self):
@@ -83,107 +215,116 @@ class Monster(object):
 	@classmethod
 	def load(cls, board, parts):
 		tp, x, y, dirn, mode, mode_time = parts
-		monster = Monster(board, tp, x, y)
+		# The saved mode is restored as-is, so skip __init__'s set_mode
+		monster = cls.__new__(cls)
+		monster.type = tp
+		monster.board = board
+		monster.cell = board.cell_id(x, y)
 		monster.mode = mode
 		monster.dirn = dirn
 		monster.mode_time = mode_time
 		return monster
 
+	@property
+	def x(self):
+		return self.board.COORDS[self.cell][0]
+
+	@property
+	def y(self):
+		return self.board.COORDS[self.cell][1]
+
 	@property
 	def position(self):
-		return self.x, self.y
+		return self.board.COORDS[self.cell]
 
 	@property
 	def dirn_str(self):
 		return DIRN_NAMES[self.dirn]
 
-	def set_mode(self):	
+	def set_mode(self):
 		if self.mode is None:
 			self.mode = "sleep"
 			self.mode_time = self.SLEEP_TIMES[self.type]
 		if self.mode_time <= 0:
-			remaining = self.board.turn - self.SLEEP_TIMES[self.type]
-			while True:
-				for mode_name, time in self.MODES[self.type]:
-					if remaining - time <= 0:
-						break
-					remaining -= time
-				else: # If remaining > 0, check the next move for options
-					continue
-				break # If we didn't continue, then exit the loop (remaining <= 0)
-			self.mode = mode_name
-			self.mode_time = time - remaining
+			self.mode, self.mode_time = self.mode_at(self.type, self.board.turn)
 
 	def do_chase(self):
 		if self.move_simple():
 			return
-		pos = (self.x, self.y)
-		options = self.board.MOVEMENT_OPTIONS[pos] - set([self.get_behind()])
 		target = self.board.project_position(self.CHASE_PROJECTION[self.type])
-		self.set_pos(closest(target, *options))
+		self.set_pos(self.closest_option(target))
 
 	def do_sleep(self):
 		pass
 
-	def set_pos(self, (x, y)):
-		if x == self.x:
-			self.dirn = UP if self.y > y else DOWN
-		elif y == self.y:
-			self.dirn = LEFT if self.x > x else RIGHT
-		if (x, y) in self.board.WARP_POINTS:
-			x, y = set(self.board.WARP_POINTS - set([(x, y)])).pop()
-		self.x = x
-		self.y = y
+	def set_pos(self, cell):
+		coords = self.board.COORDS
+		x, y = coords[cell]
+		old_x, old_y = coords[self.cell]
+		if x == old_x:
+			self.dirn = UP if old_y > y else DOWN
+		elif y == old_y:
+			self.dirn = LEFT if old_x > x else RIGHT
+		warp = self.board.WARP_TARGETS[cell]
+		self.cell = cell if warp < 0 else warp
 
 	def get_behind(self):
-		if self.dirn == LEFT:
-			return self.x+1, self.y
-		elif self.dirn == RIGHT:
-			return self.x-1, self.y
-		elif self.dirn == UP:
-			return self.x, self.y+1
-		elif self.dirn == DOWN:
-			return self.x, self.y-1
-		raise AssertionError("What direction?")
-
-	def get_options(self):
-		return 
+		return self.board.STEPS[OPPOSITE[self.dirn]][self.cell]
+
+	def closest_option(self, (x, y)):
+		return closest_cell(self.board.COORDS, x, y,
+							self.board.NEIGHBOURS[self.cell], self.get_behind())
 
 	def move_simple(self):
-		pos = (self.x, self.y)
-		if pos in self.board.ROOMS:
-			options = self.board.MOVEMENT_OPTIONS[pos] | self.board.ROOM_MOVEMENT[pos]
-			target = closest(pos, *self.board.MONSTER_EXITS)
-			self.set_pos(closest(target, *options))
+		board = self.board
+		cell = self.cell
+		if board.ROOM_BITS[cell >> 3] & (1 << (cell & 7)):
+			x, y = board.COORDS[board.EXIT_TARGETS[cell]]
+			self.set_pos(closest_cell(board.COORDS, x, y, board.ROOM_OPTIONS[cell]))
 			return True
-		options = self.board.MOVEMENT_OPTIONS[pos] - set([self.get_behind()])
-		if len(options) == 1:
-			option, = options
-			self.set_pos(option)
+		behind = self.get_behind()
+		count = 0
+		for option in board.NEIGHBOURS[cell]:
+			if option != behind:
+				count += 1
+				only = option
+		if count == 1:
+			self.set_pos(only)
 			return True
 		return False
 
 	def do_goto_fixed(self):
 		if self.move_simple():
 			return
-		pos = (self.x, self.y)
-		options = self.board.MOVEMENT_OPTIONS[pos] - set([self.get_behind()])
-		behind = self.get_behind()
-		if len(options) == 2 and behind in options:
-			option, = [o for o in options if o != behind]
-			self.set_pos(option)
+		self.set_pos(self.closest_option(self.board.TARGETS[self.type]))
+
+	def do_hunt(self):
+		"""Follow the shortest path to pacman, without turning back."""
+		if self.move_simple():
 			return
-		
-		target = self.board.TARGETS[self.type]
-		self.set_pos(closest(target, *options))
+		board = self.board
+		hop = board.next_hop(self.cell, board.cell)
+		if hop < 0 or hop == self.get_behind():
+			hop = self.closest_option(board.position)
+		self.set_pos(hop)
+
+	MODE_HANDLERS = {
+		"fixed": do_goto_fixed,
+		"chase": do_chase,
+		"hunt": do_hunt,
+		"sleep": do_sleep
+	}
 
 	def do_turn(self):
 		if self.mode_time <= 0:
 			self.set_mode()
-		self.mode_names[self.mode]()
+		self.MODE_HANDLERS[self.mode](self)
 		self.mode_time -= 1
 
 
+Monster.setup()
+
+
 class Chars(object):
 	BOUNDARIES = "-+|Xx"
 	EXITS = "="
@@ -196,10 +337,17 @@ class Chars(object):
 
 
 class Board(object):
-	
+
+	# Subclasses only add class attributes, and should declare
+	# ``__slots__ = ()`` to keep instances free of a __dict__.
+	__slots__ = ("turn", "mode", "score", "pill_bits", "pill_count",
+				 "monsters", "dirn", "cell")
+
 	BOARD = NotImplemented
 	TARGETS = NotImplemented
+	ID = NotImplemented
 	IS_SETUP = False
+	HAS_ROUTES = False
 
 	@classmethod
 	def setup(cls):
@@ -250,21 +398,160 @@ class Board(object):
 		cls.ROOM_MOVEMENT = collections.defaultdict(frozenset, {k: frozenset(v) for k, v in room_movement.iteritems()})
 		cls.WARP_POINTS = frozenset(warp_points)
 		cls.PILLS = frozenset(pills)
+		cls.PILL_ORDER = tuple(sorted(pills, key=lambda (x, y): (y, x)))
 		cls.ROOMS = frozenset(rooms)
 		cls.WALLS = frozenset(walls)
 		cls.MONSTER_EXITS = frozenset(monster_exits)
+		cls.setup_cells()
 		cls.IS_SETUP = True
 
+	@classmethod
+	def setup_cells(cls):
+		"""Flatten the tables built by setup to integer cell ids.
+
+		Cell ``(x, y)`` gets the id ``y * WIDTH + x``.  Per-cell tables
+		are tuples indexed by id, with -1 standing in for "no cell", and
+		cell sets are packed bitsets (see :func:`bitset`).
+		"""
+		size = cls.WIDTH * cls.HEIGHT
+		cls.COORDS = tuple((x, y) for y in range(cls.HEIGHT) for x in range(cls.WIDTH))
+
+		def cell_or_none(x, y):
+			if 0 <= x < cls.WIDTH and 0 <= y < cls.HEIGHT:
+				return cls.cell_id(x, y)
+			return -1
+		cls.STEPS = tuple(
+			tuple(cell_or_none(x + dx, y + dy) for x, y in cls.COORDS)
+			for dx, dy in (DIRN_DELTAS[d] for d in (LEFT, RIGHT, UP, DOWN)))
+
+		def cells(positions):
+			return tuple(sorted(cls.cell_id(x, y) for x, y in positions))
+		cls.NEIGHBOURS = tuple(
+			cells(cls.MOVEMENT_OPTIONS.get(pos, ())) for pos in cls.COORDS)
+		cls.ROOM_OPTIONS = tuple(
+			cells(cls.MOVEMENT_OPTIONS.get(pos, frozenset()) | cls.ROOM_MOVEMENT.get(pos, frozenset()))
+			for pos in cls.COORDS)
+		cls.WARP_TARGETS = tuple(
+			cls.cell_id(*set(cls.WARP_POINTS - set([pos])).pop())
+			if pos in cls.WARP_POINTS else -1
+			for pos in cls.COORDS)
+		cls.EXIT_TARGETS = tuple(
+			cls.cell_id(*closest(pos, *cls.MONSTER_EXITS))
+			if pos in cls.ROOMS else -1
+			for pos in cls.COORDS)
+		cls.PILL_CELLS = tuple(cls.cell_id(x, y) for x, y in cls.PILL_ORDER)
+		cls.PILL_BITS = bitset(size, cls.PILL_CELLS)
+		cls.WALL_BITS = bitset(size, cells(cls.WALLS))
+		cls.ROOM_BITS = bitset(size, cells(cls.ROOMS))
+
+	@classmethod
+	def setup_routes(cls):
+		"""Build the next-hop table used by monsters in "hunt" mode.
+
+		NEXT_HOP holds, for every pair of navigable cells, the direction
+		of the first step on a shortest path (warps included) from one to
+		the other, or NO_ROUTE.  It is found by a breadth first search
+		from every cell, so is cached in ``gfx/<Board>/routes.dat`` and
+		only rebuilt when the board layout changes.  It's only loaded by
+		the first call to next_hop, so boards whose monsters never hunt
+		don't pay for it.
+		"""
+		if cls.HAS_ROUTES:
+			return
+		cls.setup()
+		cls.ROUTE_CELLS = tuple(sorted(cls.cell_id(x, y) for x, y in cls.NAVIGABLE))
+		index = [-1] * len(cls.COORDS)
+		for i, cell in enumerate(cls.ROUTE_CELLS):
+			index[cell] = i
+		cls.ROUTE_INDEX = tuple(index)
+		digest = hashlib.sha1("\n".join(cls.BOARD)).digest()
+		path = os.path.join(ROUTES_DIR, cls.__name__, "routes.dat")
+		cls.NEXT_HOP = load_routes(path, digest, len(cls.ROUTE_CELLS))
+		if cls.NEXT_HOP is None:
+			cls.NEXT_HOP = cls.find_routes()
+			save_routes(path, digest, cls.NEXT_HOP)
+		cls.HAS_ROUTES = True
+
+	@classmethod
+	def find_routes(cls):
+		count = len(cls.ROUTE_CELLS)
+		table = array.array("B", [NO_ROUTE]) * (count * count)
+		moves = []
+		for cell in cls.ROUTE_CELLS:
+			cell_moves = []
+			for dirn in (LEFT, RIGHT, UP, DOWN):
+				step = cls.STEPS[dirn][cell]
+				if step >= 0 and step in cls.NEIGHBOURS[cell]:
+					warp = cls.WARP_TARGETS[step]
+					cell_moves.append((dirn, step if warp < 0 else warp))
+			moves.append(cell_moves)
+		for source, cell in enumerate(cls.ROUTE_CELLS):
+			row = source * count
+			frontier = []
+			for dirn, to in moves[source]:
+				i = cls.ROUTE_INDEX[to]
+				if i != source and table[row + i] == NO_ROUTE:
+					table[row + i] = dirn
+					frontier.append(i)
+			while frontier:
+				next_frontier = []
+				for i in frontier:
+					dirn = table[row + i]
+					for _, to in moves[i]:
+						j = cls.ROUTE_INDEX[to]
+						if j != source and table[row + j] == NO_ROUTE:
+							table[row + j] = dirn
+							next_frontier.append(j)
+				frontier = next_frontier
+		return table
+
+	@classmethod
+	def next_hop(cls, cell, target):
+		"""The cell to step to from `cell` towards `target`, or -1."""
+		if not cls.HAS_ROUTES:
+			cls.setup_routes()
+		source, dest = cls.ROUTE_INDEX[cell], cls.ROUTE_INDEX[target]
+		if source < 0 or dest < 0:
+			return -1
+		dirn = cls.NEXT_HOP[source * len(cls.ROUTE_CELLS) + dest]
+		if dirn == NO_ROUTE:
+			return -1
+		return cls.STEPS[dirn][cell]
+
+	@classmethod
+	def cell_id(cls, x, y):
+		return y * cls.WIDTH + x
+
 	def __init__(self):
 		type(self).setup()
 		self.turn = 1
 		self.mode = NOT_STARTED
 		self.score = 0
-		self.pills = set(self.PILLS)
+		self.pill_bits = bytearray(self.PILL_BITS)
+		self.pill_count = len(self.PILL_CELLS)
 		self.monsters = {t: Monster(self, t, x, y) for t, (x, y) in self.MONSTERS.iteritems()}
 		self.dirn = RIGHT
 		self.position = self.INITIAL_POSITION
 
+	@property
+	def position(self):
+		return self.COORDS[self.cell]
+
+	@position.setter
+	def position(self, (x, y)):
+		self.cell = self.cell_id(x, y)
+
+	@property
+	def pills(self):
+		bits = self.pill_bits
+		return set(self.COORDS[cell] for cell in self.PILL_CELLS
+				   if bits[cell >> 3] & (1 << (cell & 7)))
+
+	@pills.setter
+	def pills(self, pills):
+		self.pill_bits = bitset(len(self.COORDS), (self.cell_id(x, y) for x, y in pills))
+		self.pill_count = len(pills)
+
 	@property
 	def name(self):
 		return type(self).__name__
@@ -280,19 +567,77 @@ class Board(object):
 				return b
 		raise KeyError("No board with name '%s' could be found" % name)
 
+	@classmethod
+	def board_by_id(cls, board_id):
+		for b in Board.__subclasses__():
+			if b.ID == board_id:
+				return b
+		raise KeyError("No board with id %s could be found" % board_id)
+
 	def dump(self):
-		return pickle.dumps((
-			type(self).__name__, 
-			self.mode, 
-			self.turn, 
-			self.score, 
-			self.pills, 
-			{t: m.dump() for t, m in self.monsters.iteritems()},
-			self.dirn, 
-			self.position))
+		x, y = self.position
+		parts = [SAVE_HEADER.pack(
+			SAVE_VERSION,
+			self.ID,
+			self.mode,
+			self.turn,
+			self.score,
+			self.dirn,
+			x, y,
+			len(self.monsters))]
+		pill_bits = bytearray((len(self.PILL_CELLS) + 7) // 8)
+		for i, cell in enumerate(self.PILL_CELLS):
+			if self.pill_bits[cell >> 3] & (1 << (cell & 7)):
+				pill_bits[i >> 3] |= 0x80 >> (i & 7)
+		parts.append(str(pill_bits))
+		for t, m in sorted(self.monsters.iteritems()):
+			tp, mx, my, dirn, mode, mode_time = m.dump()
+			parts.append(SAVE_MONSTER.pack(
+				tp, mx, my, dirn, MONSTER_MODE_IDS[mode], mode_time))
+		return "".join(parts)
 
 	@classmethod
 	def load(cls, data):
+		"""Load a game saved by dump, or in the old pickle format.
+
+		Raises ValueError for a save in a format this code doesn't know,
+		such as a later SAVE_VERSION.
+		"""
+		first = data[:1]
+		if first and first in PICKLE_OPCODES:
+			return cls.load_pickle(data)
+		if first != chr(SAVE_VERSION):
+			raise ValueError("Unknown save format %r" % first)
+		(_, board_id, mode, turn, score, dirn, x, y,
+			num_monsters) = SAVE_HEADER.unpack_from(data)
+		# Every field is restored below, so skip __init__ and the
+		# monsters and pills it would build only to throw away.
+		board_cls = Board.board_by_id(board_id)
+		board_cls.setup()
+		board = board_cls.__new__(board_cls)
+		board.mode = mode
+		board.turn = turn
+		board.score = score
+		offset = SAVE_HEADER.size
+		pill_bits = bytearray(data[offset:offset + (len(board.PILL_CELLS) + 7) // 8])
+		offset += len(pill_bits)
+		board.pill_bits = bitset(len(board.COORDS), (
+			cell for i, cell in enumerate(board.PILL_CELLS)
+			if pill_bits[i >> 3] & (0x80 >> (i & 7))))
+		board.pill_count = sum(bin(b).count("1") for b in pill_bits)
+		board.monsters = {}
+		for i in range(num_monsters):
+			tp, mx, my, mdirn, mode_id, mode_time = SAVE_MONSTER.unpack_from(data, offset)
+			offset += SAVE_MONSTER.size
+			board.monsters[tp] = Monster.load(
+				board, (tp, mx, my, mdirn, MONSTER_MODE_NAMES[mode_id], mode_time))
+		board.dirn = dirn
+		board.position = (x, y)
+		return board
+
+	@classmethod
+	def load_pickle(cls, data):
+		"""Load a game saved in the old pickle format."""
 		bits = pickle.loads(data)
 		board_type, mode, turn, score, pills, monsters, dirn, position = bits
 		board = Board.board_by_name(board_type)()
@@ -315,56 +660,108 @@ class Board(object):
 		if self.mode != STARTED:
 			raise AssertionError("Game not in progress")
 		self.turn += 1
-		new_pos = self.project_position(1)
-		if new_pos in self.WARP_POINTS:
-			new_pos = set(self.WARP_POINTS - set([new_pos])).pop()
-			self.position = new_pos
-		elif new_pos in self.MOVEMENT_OPTIONS[self.position]:
-			self.position = new_pos
-		if new_pos in self.pills:
-			self.pills.remove(new_pos)
-			if len(self.pills) == 0:
+		new_cell = self.STEPS[self.dirn][self.cell]
+		if new_cell < 0:
+			pass
+		elif self.WARP_TARGETS[new_cell] >= 0:
+			new_cell = self.WARP_TARGETS[new_cell]
+			self.cell = new_cell
+		elif new_cell in self.NEIGHBOURS[self.cell]:
+			self.cell = new_cell
+		if new_cell >= 0 and self.pill_bits[new_cell >> 3] & (1 << (new_cell & 7)):
+			self.pill_bits[new_cell >> 3] &= ~(1 << (new_cell & 7))
+			self.pill_count -= 1
+			if self.pill_count == 0:
 				self.score += 500
 				self.mode = WON
 				return 
 			self.score += 20
-		for monster in self.monsters.values():
-			if monster.position == self.position:
+		for monster in self.monsters.itervalues():
+			if monster.cell == self.cell:
 				self.mode = GAME_OVER
 				return
 			monster.do_turn()
-			if monster.position == self.position:
+			if monster.cell == self.cell:
 				self.mode = GAME_OVER
 				return
 
+	def is_blocked(self):
+		"""True if pacman's next move would leave him where he is."""
+		new_cell = self.STEPS[self.dirn][self.cell]
+		return (new_cell < 0 or (self.WARP_TARGETS[new_cell] < 0 and
+								 new_cell not in self.NEIGHBOURS[self.cell]))
+
+	def fast_forward(self, turns):
+		"""Play up to `turns` turns, stopping as soon as the game is over.
+
+		While pacman is blocked by a wall only the monsters move, and
+		they do so as a function of their own state and of where they are
+		in their mode schedule.  Once that combined state repeats, whole
+		cycles are skipped rather than played out.  Monsters that won't
+		change mode before `turns` is up are keyed without their schedule,
+		so they don't stretch the cycle.
+
+		Returns the number of turns actually taken.
+		"""
+		played = 0
+		seen = {}
+		while played < turns and self.mode in (NOT_STARTED, STARTED):
+			remaining = turns - played
+			key = self._cycle_key(remaining) if self.is_blocked() else None
+			if key is None:
+				seen.clear()
+			elif key in seen:
+				period = played - seen[key]
+				skip = (remaining // period) * period
+				self.turn += skip
+				for monster in self.monsters.values():
+					if monster.mode_time >= remaining:
+						monster.mode_time -= skip
+				played += skip
+				seen.clear()
+				continue
+			else:
+				seen[key] = played
+			self.do_turn()
+			played += 1
+		return played
+
+	def _cycle_key(self, remaining):
+		key = []
+		for monster in self.monsters.values():
+			if monster.mode_time >= remaining:
+				key.append((monster.type, monster.cell, monster.dirn, monster.mode))
+				continue
+			since_wake = self.turn - monster.SLEEP_TIMES[monster.type]
+			if since_wake <= 0:
+				return None
+			period = monster.PERIODS[monster.type]
+			key.append((monster.type, monster.cell, monster.dirn,
+						monster.mode, monster.mode_time, since_wake % period))
+		return tuple(key)
+
 	def project_position(self, n):
-		x, y = self.position
-		if self.dirn == UP:
-			return x, y - n
-		elif self.dirn == DOWN:
-			return x, y + n
-		elif self.dirn == LEFT:
-			return x - n, y
-		elif self.dirn == RIGHT:
-			return x + n, y
-		raise AssertionError("What direction?")
+		x, y = self.COORDS[self.cell]
+		dx, dy = DIRN_DELTAS[self.dirn]
+		return x + dx * n, y + dy * n
 
 	def to_string(self):
 		output = []
-		monsters = [(m.x, m.y) for m in self.monsters.values()]
+		monsters = set(m.cell for m in self.monsters.itervalues())
 		for y in range(self.HEIGHT):
 			row = ""
-			for x in range(self.WIDTH):
-				if (x, y) == self.position:
+			for cell in range(y * self.WIDTH, (y + 1) * self.WIDTH):
+				if cell == self.cell:
 					row += {LEFT: ">", RIGHT: "<", 
 						   UP: "V", DOWN: "^"}[self.dirn]
 					continue
-				if (x, y) in monsters:
+				bit = 1 << (cell & 7)
+				if cell in monsters:
 					row += "M"
-				elif (x, y) in self.pills:
+				elif self.pill_bits[cell >> 3] & bit:
 					row += "."
 				else:
-					row += ("X" if (x, y) in self.WALLS else " ") 
+					row += ("X" if self.WALL_BITS[cell >> 3] & bit else " ") 
 			output.append(row)
 		output.append("Turn: %s" % self.turn)
 		output.append("Score: %s" % self.score)
@@ -372,6 +769,8 @@ class Board(object):
 
 
 class MetaBoard(Board):
+	__slots__ = ()
+	ID = 0
 	BOARD = """
 +------------++------------+
 |                          |
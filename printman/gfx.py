@@ -1,3 +1,4 @@
+import cStringIO as StringIO
 import itertools
 import math
 import os
@@ -10,16 +11,30 @@ import board
 OUT_DIR = "./"
 
 
-def saveb(bits, w, h, name):
+def encode_packed(bits, w, h):
+	"""PNG data for `bits`, one int per row as drawn by board_bits."""
 	writer = png.Writer(width=w, height=h, greyscale=True, bitdepth=1)
+	buf = StringIO.StringIO()
+	writer.write_packed(buf, png.pack_rows(bits, w))
+	return buf.getvalue()
+
+
+def encode(bits, w, h):
+	"""PNG data for `bits`, a list of rows of 0s and 1s."""
+	writer = png.Writer(width=w, height=h, alpha=False, greyscale=True, bitdepth=1)
+	buf = StringIO.StringIO()
+	writer.write(buf, bits)
+	return buf.getvalue()
+
+
+def saveb(bits, w, h, name):
 	with open(os.path.join(OUT_DIR, "%s.png" % (name, )), "wb") as fh:
-		writer.write(fh, bits)
+		fh.write(encode_packed(bits, w, h))
 
 
 def save(bits, w, h, name):
-	writer = png.Writer(width=w, height=h, alpha=False, greyscale=True, bitdepth=1)
 	with open(os.path.join(OUT_DIR, "%s.png" % (name, )), "wb") as fh:
-		writer.write(fh, bits)
+		fh.write(encode(bits, w, h))
 
 
 def to_alpha(rows):
@@ -115,86 +130,86 @@ def draw_wall(size, bx, ax, by, ay):
 	return cells
 
 
-def erode(data, edge):
-	def any_bits(x, y):
-		if data[y][x]:
-			return True
-		if y == 0 or x == 0:
-			return edge
-		if data[y][x-1] or data[y-1][x]:
-			return True
-		try:
-			if data[y+1][x]:
-				return True
-			if data[y][x+1]:
-				return True
-		except IndexError:
-			return edge
-		return False
+# The board is drawn as a list of ints, one per row of pixels, with the
+# most significant of `width` bits as the leftmost pixel, so that each
+# pass below works on whole rows with shifts and masks.
+
+
+def run(width, start, end):
+	"""The bits for pixels start to end - 1 of a row `width` wide."""
+	if end <= start:
+		return 0
+	return ((1 << (end - start)) - 1) << (width - end)
+
+
+def erode(bits, width, edge):
+	"""Set every pixel with a set neighbour above, below, left or right.
+
+	Pixels on the top row and left column, and ones on the bottom row or
+	right column with no set neighbour yet, take the value of `edge`.
+	"""
+	full = (1 << width) - 1
+	first = 1 << (width - 1)
+	edge_bits = full if edge else 0
 	new = []
-	for y, row in enumerate(data):
-		new_row = [0] * len(row)
-		new.append(new_row)
-		for x, bit in enumerate(row):
-			new_row[x] = (1 if any_bits(x, y) else 0)
+	last = len(bits) - 1
+	for y, row in enumerate(bits):
+		if y == 0:
+			new.append(row | edge_bits)
+			continue
+		val = row | (row >> 1) | bits[y - 1]
+		if y == last:
+			val |= edge_bits
+		else:
+			val |= bits[y + 1] | ((row << 1) & full) | (edge_bits & 1)
+		val = (val & ~first) | (row & first) | (edge_bits & first)
+		new.append(val)
 	return new
 
 
-def outline(data):
-	def any_different(x, y, test):
-		if y > 0 and data[y-1][x] != test:
-			return True
-		if x > 0 and data[y][x-1] != test:
-			return True
-		try:
-			if data[y+1][x] != test:
-				return True
-		except IndexError:
-			pass
-		try:
-			if data[y][x+1] != test:
-				return True
-		except IndexError:
-			pass
-		return False
+def outline(bits, width):
+	"""Keep the pixels with a neighbour of a different value, and clear
+	the rest to 1."""
+	full = (1 << width) - 1
+	has_left = full >> 1
+	has_right = full & ~1
 	new = []
-	for y, row in enumerate(data):
-		new_row = [0] * len(row)
-		new.append(new_row)
-		for x, bit in enumerate(row):
-			new_row[x] = (data[y][x] if any_different(x, y, data[y][x]) else 1)
+	last = len(bits) - 1
+	for y, row in enumerate(bits):
+		diff = ((row ^ (row >> 1)) & has_left) | ((row ^ (row << 1)) & has_right)
+		if y > 0:
+			diff |= row ^ bits[y - 1]
+		if y < last:
+			diff |= row ^ bits[y + 1]
+		diff &= full
+		new.append((row & diff) | (full & ~diff))
 	return new
 
 
-def invert(grid):
-	return [[0 if c else 1 for c in row] for row in grid]
+def invert(bits, width):
+	full = (1 << width) - 1
+	return [full ^ row for row in bits]
 
 def pattern(w, h):
-	return [[int((x + y) % 3 == 0) for x in range(w)] for y in range(h)]
+	# Pixels where (x + y) % 3 == 0: every third pixel, with each row
+	# starting a pixel further left than the one below it.
+	repeat = int("100" * (w // 3 + 3), 2)
+	extra = 3 * (w // 3 + 3) - w
+	return [(repeat >> (extra + (-y % 3))) & ((1 << w) - 1) for y in range(h)]
 
 def mask(a, b):
-	rows = []
-	for arow, brow in zip(a, b):
-		row = [0] * len(arow)
-		rows.append(row)
-		for x, (ac, bc) in enumerate(zip(arow, brow)):
-			row[x] = (ac | bc)
-	return rows
+	return [ac | bc for ac, bc in zip(a, b)]
 
 def add(a, b):
-	rows = []
-	for arow, brow in zip(a, b):
-		row = [0] * len(arow)
-		rows.append(row)
-		for x, (ac, bc) in enumerate(zip(arow, brow)):
-			row[x] = (ac & bc)
-	return rows
+	return [ac & bc for ac, bc in zip(a, b)]
 
 LOGO_WIDTH = 333
 LOGO_HEIGHT = 45
 QR_SIZE = 74
 
-def draw_grid(grid, size):
+def board_bits(grid, size):
+	"""The board picture for `grid` on a page `size` pixels wide, as
+	(width, height, rows) with a row of pixels per int."""
 	cell_size = int(size / grid.WIDTH)
 	image_width = grid.WIDTH * cell_size
 
@@ -212,45 +227,41 @@ def draw_grid(grid, size):
 			return False
 		return (x, y) in grid.WALLS
 
-	empty_cell = [[1] * cell_size for i in range(cell_size)]
-	full_cell = [[0] * cell_size for i in range(cell_size)]
-
-	cells = [[] for i in range(image_height)]
+	cells = []
 
+	logo = run(image_width, logo_padding + 1, logo_width_adj + logo_padding)
 	for y in range(header_height):
-		for x in range(image_width):
-			val = 1 if (y > logo_padding 
-						and y < LOGO_HEIGHT + logo_padding 
-						and x > logo_padding 
-						and x < logo_width_adj + logo_padding) else 0
-			cells[y].append(val)
-
-	for y in range(footer_height):
-		cells[footer_top + y].extend(
-			[0] * image_width)
-
-	for y in range(footer_top, footer_top + footer_height - cell_size):
-		for x in range(image_width - QR_SIZE - cell_size, image_width - cell_size):
-			cells[y][x] = 1
+		cells.append(logo if logo_padding < y < LOGO_HEIGHT + logo_padding else 0)
 
 	for y in range(grid.HEIGHT):
+		row = 0
 		for x in range(grid.WIDTH):
-			for py, row in enumerate(full_cell if is_wall(x, y) else empty_cell):
-				cells[(y * cell_size) + header_height + py].extend(row)
+			if not is_wall(x, y):
+				row |= run(image_width, x * cell_size, (x + 1) * cell_size)
+		cells.extend([row] * cell_size)
+
+	qr_box = run(image_width, image_width - QR_SIZE - cell_size, image_width - cell_size)
+	cells.extend([qr_box] * (footer_height - cell_size))
+	cells.extend([0] * cell_size)
+
 	for i in range(4):
-		cells = erode(cells, True)
-	cells = invert(cells)
+		cells = erode(cells, image_width, True)
+	cells = invert(cells, image_width)
 	for i in range(2):
-		cells = erode(cells, False)
-	cells = invert(cells)
-	out = outline(cells)
-	cells = erode(cells, True)
-	cells = erode(cells, True)
+		cells = erode(cells, image_width, False)
+	cells = invert(cells, image_width)
+	out = outline(cells, image_width)
+	cells = erode(cells, image_width, True)
+	cells = erode(cells, image_width, True)
 
-	patt = pattern(grid.WIDTH * cell_size, image_height)
+	patt = pattern(image_width, image_height)
 
-	final = add(mask(patt, cells), out)
-	saveb(final, grid.WIDTH * cell_size, image_height, "%s/board" % grid.__name__)
+	return image_width, image_height, add(mask(patt, cells), out)
+
+
+def draw_grid(grid, size):
+	width, height, bits = board_bits(grid, size)
+	saveb(bits, width, height, "%s/board" % grid.__name__)
 
 
 def main():
@@ -168,6 +168,7 @@ from __future__ import generators
 __version__ = "$URL$ $Rev$"
 
 from array import array
+import binascii
 try: # See :pyver:old
     import itertools
 except:
@@ -208,6 +209,241 @@ def group(s, n):
     # http://www.python.org/doc/2.6/library/functions.html#zip
     return zip(*[iter(s)]*n)
 
+# Translation table taking sample values 0 to 15 to hex digits.
+_sample_digits = ''.join(['0123456789abcdef'[i:i+1] or chr(i)
+                          for i in range(256)])
+
+def pack_samples(row, bitdepth):
+    """Pack a row of samples, for `bitdepth` 1, 2 or 4, into a string
+    of bytes.  The last byte is padded with zero bits.
+
+    Rather than pack each group of samples into a byte, the samples are
+    turned into the digits of one base ``2**bitdepth`` number, which is
+    then written out in hex.  An ``array`` of type ``'c'`` is taken to
+    hold those digits already (for example, a 1 bit image drawn in
+    ``'0'`` and ``'1'`` characters).
+    """
+
+    if isarray(row) and row.typecode == 'c':
+        digits = row.tostring()
+    else:
+        digits = tostring(array('B', row)).translate(_sample_digits)
+    # samples per byte
+    spb = 8 // bitdepth
+    digits += '0' * (-len(digits) % spb)
+    if bitdepth == 4:
+        return binascii.unhexlify(digits)
+    return binascii.unhexlify('%0*x' % (2 * len(digits) // spb,
+                                        int(digits, 1 << bitdepth)))
+
+def pack_rows(rows, width):
+    """Pack 1 bit rows, each an int of `width` bits with the leftmost
+    pixel as its most significant bit, into strings of bytes: the
+    boxed row packed format :meth:`Writer.write_packed` takes.  A row
+    that repeats is only packed once.
+    """
+
+    size = (width + 7) // 8
+    pad = size * 8 - width
+    fmt = '%%0%dx' % (size * 2)
+    packed = {}
+    out = []
+    for row in rows:
+        data = packed.get(row)
+        if data is None:
+            data = packed[row] = binascii.unhexlify(fmt % (row << pad))
+        out.append(data)
+    return out
+
+def unpack_rows(rows, width):
+    """The inverse of :func:`pack_rows`.  Each row of packed bytes (a
+    string, or an ``array`` as :meth:`Reader.read_packed` gives them)
+    becomes an int of `width` bits.
+    """
+
+    pad = -width % 8
+    return [int(binascii.hexlify(row), 16) >> pad for row in rows]
+
+def bytewise_sub(a, b, high):
+    """Subtract the bytes of the int `b` from those of the int `a`, each
+    byte on its own and modulo 256, as PNG's filters do.  `high` has the
+    top bit of every byte set.  No borrow crosses from one byte to the
+    next, so a whole scanline is done in a few operations.
+    """
+    return ((a | high) - (b & ~high)) ^ ((a ^ ~b) & high)
+
+# The filter types, by number.  Writer's `filter_strategy` may be one of
+# these names, or its number, to use that filter for every scanline.
+FILTER_TYPES = ('none', 'sub', 'up', 'average', 'paeth')
+
+# Values for Writer's `filter_strategy`.  ``'fixed'`` is another name
+# for ``None``: the "none" filter, fixed for every scanline.
+FILTER_STRATEGIES = (None, 'fixed', 'dedup', 'adaptive') + FILTER_TYPES
+
+# Whether :func:`scanline_filter` may use NumPy.  It is only imported
+# once a filter_strategy needs it, so that writing unfiltered images
+# doesn't pay for loading it.
+use_numpy = True
+
+# Each byte as a signed value's distance from zero, for the sum of
+# absolute differences of a filtered scanline.
+_sad_table = ''.join(chr(min(i, 256 - i)) for i in range(256))
+
+def python_filters(types, line, prev, fo):
+    """Yield ``(type, filtered)`` for each filter type in `types`, with
+    `line`, `prev` and `fo` as for :func:`filter_scanline` but as
+    strings of bytes (`prev` may be ``None`` for the first scanline).
+
+    "sub", "up" and "average" work on each scanline as one int, a byte
+    at a time only as far as Python's long arithmetic goes.
+    """
+    n = len(line)
+    high = int('80' * n, 16)
+    x = int(binascii.hexlify(line), 16)
+    a = x >> (8 * fo)
+    b = 0
+    if prev is not None:
+        b = int(binascii.hexlify(prev), 16)
+    for type in types:
+        if type == 0:
+            yield type, line
+            continue
+        if type == 1:
+            value = bytewise_sub(x, a, high)
+        elif type == 2:
+            value = bytewise_sub(x, b, high)
+        elif type == 3:
+            # floor((a + b) / 2) for each byte, without carries
+            value = bytewise_sub(x, (a & b) + (((a ^ b) >> 1) & ~high),
+                                 high)
+        else:
+            out = filter_scanline(type, array('B', line), fo,
+                                  array('B', prev or '\0' * n))
+            yield type, tostring(out[1:])
+            continue
+        yield type, binascii.unhexlify('%0*x' % (2 * n, value))
+
+def numpy_filters(types, line, prev, fo):
+    """The same as :func:`python_filters`, using NumPy."""
+    import numpy
+    uint8 = numpy.uint8
+    x = numpy.frombuffer(line, uint8)
+    if prev is None:
+        b = numpy.zeros_like(x)
+    else:
+        b = numpy.frombuffer(prev, uint8)
+    a = numpy.zeros_like(x)
+    a[fo:] = x[:-fo]
+    for type in types:
+        if type == 0:
+            yield type, line
+            continue
+        if type == 1:
+            predicted = a
+        elif type == 2:
+            predicted = b
+        elif type == 3:
+            predicted = ((a.astype(numpy.uint16) + b) >> 1).astype(uint8)
+        else:
+            c = numpy.zeros_like(x)
+            c[fo:] = b[:-fo]
+            a16 = a.astype(numpy.int16)
+            b16 = b.astype(numpy.int16)
+            c16 = c.astype(numpy.int16)
+            pa = numpy.abs(b16 - c16)
+            pb = numpy.abs(a16 - c16)
+            pc = numpy.abs(a16 + b16 - 2 * c16)
+            predicted = numpy.where((pa <= pb) & (pa <= pc), a,
+                                    numpy.where(pb <= pc, b, c))
+        yield type, (x - predicted).tostring()
+
+def scanline_filter(strategy, fo, bitdepth=8, palette=False):
+    """Return a function choosing the filter for each scanline, for the
+    `strategy` given to Writer (other than ``None``).
+
+    The function takes a scanline and the one above it (``None`` for
+    the first of the image, or of an interlaced pass), as unfiltered
+    strings of bytes, and returns the filter type and the filtered
+    scanline.  `fo` is the filter offset, as for :func:`filter_scanline`.
+
+    The name of a filter type uses that filter for every scanline.
+    ``'dedup'`` uses "up" for a scanline that repeats the one above, so
+    that zlib sees a line of zeros, and "none" otherwise.
+    ``'adaptive'`` does the same for repeats, and otherwise picks the
+    filter that leaves the smallest sum of absolute differences, with
+    the filtered bytes taken as signed.  As the PNG specification
+    advises, palette images and those of less than 8 bits per sample
+    (`bitdepth`) are otherwise left unfiltered: neighbouring palette
+    indexes needn't be close in value, and packed pixels don't line up
+    with bytes, so filtering them rarely helps.
+
+    NumPy is used to filter the scanlines when it can be imported (and
+    :data:`use_numpy` is true).
+    """
+
+    numpy = None
+    if use_numpy:
+        try:
+            import numpy
+        except ImportError:
+            pass
+    if numpy is not None:
+        filters = numpy_filters
+    else:
+        filters = python_filters
+
+    def repeat(line, prev):
+        if line == prev:
+            return 2, '\0' * len(line)
+        return None
+
+    if strategy in FILTER_TYPES:
+        types = (FILTER_TYPES.index(strategy),)
+        def choose(line, prev):
+            for chosen in filters(types, line, prev, fo):
+                return chosen
+        return choose
+
+    if strategy == 'dedup' or bitdepth < 8 or palette:
+        def choose(line, prev):
+            return repeat(line, prev) or (0, line)
+        return choose
+
+    assert strategy == 'adaptive'
+    def choose(line, prev):
+        chosen = repeat(line, prev)
+        if chosen:
+            return chosen
+        # With no scanline above, "up" is the same as "none" and
+        # "paeth" the same as "sub".
+        types = (0, 1, 2, 3, 4)
+        if prev is None:
+            types = (0, 1, 3)
+        best = None
+        for type, filtered in filters(types, line, prev, fo):
+            if numpy is not None:
+                signed = numpy.frombuffer(filtered, numpy.int8)
+                sad = numpy.abs(signed.astype(numpy.int32)).sum()
+            else:
+                sad = sum(bytearray(filtered.translate(_sad_table)))
+            if best is None or sad < best:
+                best = sad
+                chosen = type, filtered
+        return chosen
+    return choose
+
+def apply_scanline_filter(data, start, prev, choose):
+    """Filter the scanline at the end of the array `data`, whose filter
+    type byte is at `start`, in place.  `prev` is the unfiltered
+    scanline above it; the unfiltered scanline is returned."""
+    line = tostring(data[start + 1:])
+    type, filtered = choose(line, prev)
+    data[start] = type
+    if filtered is not line:
+        del data[start + 1:]
+        data.fromstring(filtered)
+    return line
+
 def isarray(x):
     """Same as ``isinstance(x, array)`` except on Python 2.2, where it
     always returns ``False``.  This helps PyPNG work on Python 2.2.
@@ -231,6 +467,12 @@ else:
         """
         return row.tostring()
 
+# A view of an array's bytes, for zlib, that doesn't copy them.
+try:
+    bytesview = buffer
+except NameError:
+    bytesview = memoryview
+
 # Conditionally convert to bytes.  Works on Python 2 and Python 3.
 try:
     bytes('', 'ascii')
@@ -333,7 +575,8 @@ class Writer:
                  planes=None,
                  colormap=None,
                  maxval=None,
-                 chunk_limit=2**20):
+                 chunk_limit=2**20,
+                 filter_strategy=None):
         """
         Create a PNG encoder object.
 
@@ -363,6 +606,10 @@ class Writer:
           Create an interlaced image.
         chunk_limit
           Write multiple ``IDAT`` chunks to save memory.
+        filter_strategy
+          How scanline filters are chosen: ``None`` (the default, also
+          called ``'fixed'``) for no filtering, ``'dedup'``,
+          ``'adaptive'``, or a filter type.
 
         The image size (in pixels) can be specified either by using the
         `width` and `height` arguments, or with the single `size`
@@ -450,6 +697,20 @@ class Writer:
         `chunk_limit` is used to limit the amount of memory used whilst
         compressing the image.  In order to avoid using large amounts of
         memory, multiple ``IDAT`` chunks may be created.
+
+        `filter_strategy` trades encoding time for a smaller file.  With
+        ``None`` every scanline is written unfiltered, which is the
+        fastest.  ``'dedup'`` costs a string comparison per scanline and
+        writes each scanline that repeats the one above as zeros, using
+        the "up" filter, which suits images with long runs of identical
+        rows.  ``'adaptive'`` also tries every filter on every other
+        scanline of a greyscale or colour image of 8 or 16 bits per
+        sample (not a palette image), and keeps the one that leaves the
+        smallest sum of absolute differences, the heuristic the PNG
+        specification suggests.  A filter type, by name (see
+        :data:`FILTER_TYPES`) or number (0 to 4), uses that filter for
+        every scanline.  NumPy is imported to filter scanlines if it's
+        available, but only when a filter_strategy is given.
         """
 
         # At the moment the `planes` argument is ignored;
@@ -593,6 +854,13 @@ class Writer:
         self.bitdepth = int(bitdepth)
         self.compression = compression
         self.chunk_limit = chunk_limit
+        if filter_strategy in range(len(FILTER_TYPES)):
+            filter_strategy = FILTER_TYPES[filter_strategy]
+        if filter_strategy not in FILTER_STRATEGIES:
+            raise ValueError("unknown filter_strategy %r" % (filter_strategy,))
+        if filter_strategy in ('fixed', 'none'):
+            filter_strategy = None
+        self.filter_strategy = filter_strategy
         self.interlace = bool(interlace)
         self.palette = check_palette(palette)
 
@@ -637,16 +905,10 @@ class Writer:
           Interlacing will require the entire image to be in working memory.
         """
 
-        if self.interlace:
-            fmt = 'BH'[self.bitdepth > 8]
-            a = array(fmt, itertools.chain(*rows))
-            return self.write_array(outfile, a)
-        else:
-            nrows = self.write_passes(outfile, rows)
-            if nrows != self.height:
-                raise ValueError(
-                  "rows supplied (%d) does not match height (%d)" %
-                  (nrows, self.height))
+        self.begin(outfile)
+        for row in rows:
+            self.write_row(row)
+        self.finish()
 
     def write_passes(self, outfile, rows, packed=False):
         """
@@ -668,6 +930,74 @@ class Writer:
 
         """
 
+        self.start_scanlines(outfile, packed)
+        for row in rows:
+            self.write_scanline(row)
+        return self.end_scanlines()
+
+    def begin(self, outfile, packed=False):
+        """
+        Start writing a PNG image to the output file, a row at a time:
+        call :meth:`write_row` for each row, top to bottom, then
+        :meth:`finish`.
+
+        Rows are filtered and compressed as they arrive, and the
+        compressed data is written out in ``IDAT`` chunks, so for a
+        straightlaced image no more than about `chunk_limit` bytes are
+        held at once, however tall the image.  `packed` is as for
+        :meth:`write_passes`.
+
+        .. note ::
+
+          Interlacing will require the entire image to be in working
+          memory: rows are kept until :meth:`finish`, which then writes
+          the reduced passes.  Packed rows can't be interlaced this way.
+        """
+
+        if self.interlace:
+            if packed:
+                raise Error("packed rows can't be interlaced by write_row")
+            self.outfile = outfile
+            self.pixels = array('BH'[self.bitdepth > 8])
+            self.row_count = 0
+        else:
+            self.start_scanlines(outfile, packed)
+            self.pixels = None
+
+    def write_row(self, row):
+        """Add the next row of the image started by :meth:`begin`."""
+
+        if self.pixels is None:
+            self.write_scanline(row)
+        else:
+            self.pixels.extend(row)
+            self.row_count += 1
+
+    def finish(self):
+        """Finish the image started by :meth:`begin`, checking that
+        every row was given."""
+
+        if self.pixels is None:
+            nrows = self.end_scanlines()
+        else:
+            nrows = self.row_count
+            pixels = self.pixels
+            self.pixels = None
+            if nrows == self.height:
+                self.write_passes(self.outfile,
+                                  self.array_scanlines_interlace(pixels))
+        if nrows != self.height:
+            raise ValueError(
+              "rows supplied (%d) does not match height (%d)" %
+              (nrows, self.height))
+
+    def start_scanlines(self, outfile, packed=False):
+        """
+        Write the chunks that come before the image data, and get ready
+        for :meth:`write_scanline`.  `packed` is as for
+        :meth:`write_passes`.
+        """
+
         # http://www.w3.org/TR/PNG/#5PNG-file-signature
         outfile.write(_signature)
 
@@ -730,7 +1060,14 @@ class Writer:
         # function packs/decomposes the pixel values into bytes and
         # stuffs them onto the data array.
         data = array('B')
-        if self.bitdepth == 8 or packed:
+        if packed:
+            def extend(sl):
+                # Packed rows may also be strings of bytes
+                if isinstance(sl, str):
+                    data.fromstring(sl)
+                else:
+                    data.extend(sl)
+        elif self.bitdepth == 8:
             extend = data.extend
         elif self.bitdepth == 16:
             # Decompose into bytes
@@ -740,20 +1077,9 @@ class Writer:
         else:
             # Pack into bytes
             assert self.bitdepth < 8
-            # samples per byte
-            spb = int(8/self.bitdepth)
+            bitdepth = self.bitdepth
             def extend(sl):
-                a = array('B', sl)
-                # Adding padding bytes so we can group into a whole
-                # number of spb-tuples.
-                l = float(len(a))
-                extra = math.ceil(l / float(spb))*spb - l
-                a.extend([0]*int(extra))
-                # Pack into bytes
-                l = group(a, spb)
-                l = map(lambda e: reduce(lambda x,y:
-                                           (x << self.bitdepth) + y, e), l)
-                data.extend(l)
+                data.fromstring(pack_samples(sl, bitdepth))
         if self.rescale:
             oldextend = extend
             factor = \
@@ -761,63 +1087,102 @@ class Writer:
             def extend(sl):
                 oldextend(map(lambda x: int(round(factor*x)), sl))
 
-        # Build the first row, testing mostly to see if we need to
-        # changed the extend function to cope with NumPy integer types
-        # (they cause our ordinary definition of extend to fail, so we
-        # wrap it).  See
-        # http://code.google.com/p/pypng/issues/detail?id=44
-        enumrows = enumerate(rows)
-        del rows
+        # Filters are chosen for each scanline as it is added.  Each
+        # reduced pass image starts afresh, with no scanline above its
+        # first, so note the row at which each pass starts.
+        choose = None
+        if self.filter_strategy is not None:
+            choose = scanline_filter(self.filter_strategy, max(1, self.psize),
+                                     self.bitdepth, bool(self.palette))
+        pass_starts = set()
+        if self.interlace:
+            start = 0
+            for xstart, ystart, xstep, ystep in _adam7:
+                if xstart >= self.width:
+                    continue
+                pass_starts.add(start)
+                start += len(range(ystart, self.height, ystep))
+
+        self.outfile = outfile
+        self.compressor = compressor
+        self.data = data
+        self.extend = extend
+        self.choose = choose
+        self.pass_starts = pass_starts
+        self.prev = None
+        self.scanlines = 0
+
+    def write_scanline(self, row):
+        """
+        Filter the next scanline, as for :meth:`write_passes`, and
+        compress it once `chunk_limit` bytes are waiting.
+        """
 
-        # First row's filter type.
+        data = self.data
+        # Add "None" filter type; unless a filter_strategy is in use,
+        # this filter type is used for every scanline.
+        start = len(data)
         data.append(0)
-        # :todo: Certain exceptions in the call to ``.next()`` or the
-        # following try would indicate no row data supplied.
-        # Should catch.
-        i,row = enumrows.next()
-        try:
-            # If this fails...
-            extend(row)
-        except:
-            # ... try a version that converts the values to int first.
-            # Not only does this work for the (slightly broken) NumPy
-            # types, there are probably lots of other, unknown, "nearly"
-            # int types it works for.
-            def wrapmapint(f):
-                return lambda sl: f(map(int, sl))
-            extend = wrapmapint(extend)
-            del wrapmapint
-            extend(row)
-
-        for i,row in enumrows:
-            # Add "None" filter type.  Currently, it's essential that
-            # this filter type be used for every scanline as we do not
-            # mark the first row of a reduced pass image; that means we
-            # could accidentally compute the wrong filtered scanline if
-            # we used "up", "average", or "paeth" on such a line.
-            data.append(0)
-            extend(row)
-            if len(data) > self.chunk_limit:
-                compressed = compressor.compress(tostring(data))
-                if len(compressed):
-                    # print >> sys.stderr, len(data), len(compressed)
-                    write_chunk(outfile, 'IDAT', compressed)
-                # Because of our very witty definition of ``extend``,
-                # above, we must re-use the same ``data`` object.  Hence
-                # we use ``del`` to empty this one, rather than create a
-                # fresh one (which would be my natural FP instinct).
-                del data[:]
+        if self.scanlines:
+            self.extend(row)
+        else:
+            # Test the first row mostly to see if we need to change the
+            # extend function to cope with NumPy integer types (they
+            # cause our ordinary definition of extend to fail, so we
+            # wrap it).  See
+            # http://code.google.com/p/pypng/issues/detail?id=44
+            try:
+                # If this fails...
+                self.extend(row)
+            except:
+                # ... try a version that converts the values to int
+                # first.  Not only does this work for the (slightly
+                # broken) NumPy types, there are probably lots of other,
+                # unknown, "nearly" int types it works for.
+                del data[start + 1:]
+                def wrapmapint(f):
+                    return lambda sl: f(map(int, sl))
+                self.extend = wrapmapint(self.extend)
+                del wrapmapint
+                self.extend(row)
+        if self.choose is not None:
+            if self.scanlines in self.pass_starts:
+                self.prev = None
+            self.prev = apply_scanline_filter(data, start, self.prev,
+                                              self.choose)
+        self.scanlines += 1
+        if len(data) > self.chunk_limit:
+            # Compressed straight from the array, without copying it
+            # into a string first.
+            compressed = self.compressor.compress(bytesview(data))
+            if len(compressed):
+                # print >> sys.stderr, len(data), len(compressed)
+                write_chunk(self.outfile, 'IDAT', compressed)
+            # Because of our very witty definition of ``extend``,
+            # above, we must re-use the same ``data`` object.  Hence we
+            # use ``del`` to empty this one, rather than create a fresh
+            # one (which would be my natural FP instinct).
+            del data[:]
+
+    def end_scanlines(self):
+        """
+        Compress what's left of the scanlines and finish the file.
+        Return the number of scanlines written.
+        """
+
+        data = self.data
         if len(data):
-            compressed = compressor.compress(tostring(data))
+            compressed = self.compressor.compress(bytesview(data))
         else:
             compressed = ''
-        flushed = compressor.flush()
+        flushed = self.compressor.flush()
         if len(compressed) or len(flushed):
             # print >> sys.stderr, len(data), len(compressed), len(flushed)
-            write_chunk(outfile, 'IDAT', compressed + flushed)
+            write_chunk(self.outfile, 'IDAT', compressed + flushed)
         # http://www.w3.org/TR/PNG/#11IEND
-        write_chunk(outfile, 'IEND')
-        return i+1
+        write_chunk(self.outfile, 'IEND')
+        del self.data, self.extend, self.compressor, self.prev
+        return self.scanlines
 
     def write_array(self, outfile, pixels):
         """
@@ -1863,6 +2228,41 @@ class Reader:
                 not self.colormap and len(data) != self.planes):
                 raise FormatError("sBIT chunk has incorrect length.")
 
+    def idat(self, lenient=False):
+        """Iterator that yields all the ``IDAT`` chunks as strings."""
+        while True:
+            try:
+                type, data = self.chunk(lenient=lenient)
+            except ValueError, e:
+                raise ChunkError(e.args[0])
+            if type == 'IEND':
+                # http://www.w3.org/TR/PNG/#11IEND
+                break
+            if type != 'IDAT':
+                continue
+            # type == 'IDAT'
+            # http://www.w3.org/TR/PNG/#11IDAT
+            if self.colormap and not self.plte:
+                warnings.warn("PLTE chunk is required before IDAT chunk")
+            yield data
+
+    def idatdecomp(self, lenient=False):
+        """Iterator that yields decompressed strings, from the ``IDAT``
+        chunks (see :meth:`idat`).
+        """
+
+        # Currently, with no max_length paramter to decompress, this
+        # routine will do one yield per IDAT chunk.  So not very
+        # incremental.
+        d = zlib.decompressobj()
+        # Each IDAT chunk is passed to the decompressor, then any
+        # remaining state is decompressed out.
+        for data in self.idat(lenient):
+            # :todo: add a max_length argument here to limit output
+            # size.
+            yield array('B', d.decompress(data))
+        yield array('B', d.flush())
+
     def read(self, lenient=False):
         """
         Read the PNG file and decode it.  Returns (`width`, `height`,
@@ -1876,43 +2276,8 @@ class Reader:
         checksum failures will raise warnings rather than exceptions.
         """
 
-        def iteridat():
-            """Iterator that yields all the ``IDAT`` chunks as strings."""
-            while True:
-                try:
-                    type, data = self.chunk(lenient=lenient)
-                except ValueError, e:
-                    raise ChunkError(e.args[0])
-                if type == 'IEND':
-                    # http://www.w3.org/TR/PNG/#11IEND
-                    break
-                if type != 'IDAT':
-                    continue
-                # type == 'IDAT'
-                # http://www.w3.org/TR/PNG/#11IDAT
-                if self.colormap and not self.plte:
-                    warnings.warn("PLTE chunk is required before IDAT chunk")
-                yield data
-
-        def iterdecomp(idat):
-            """Iterator that yields decompressed strings.  `idat` should
-            be an iterator that yields the ``IDAT`` chunk data.
-            """
-
-            # Currently, with no max_length paramter to decompress, this
-            # routine will do one yield per IDAT chunk.  So not very
-            # incremental.
-            d = zlib.decompressobj()
-            # Each IDAT chunk is passed to the decompressor, then any
-            # remaining state is decompressed out.
-            for data in idat:
-                # :todo: add a max_length argument here to limit output
-                # size.
-                yield array('B', d.decompress(data))
-            yield array('B', d.flush())
-
         self.preamble(lenient=lenient)
-        raw = iterdecomp(iteridat())
+        raw = self.idatdecomp(lenient)
 
         if self.interlace:
             raw = array('B', itertools.chain(*raw))
@@ -1923,6 +2288,27 @@ class Reader:
                        *[iter(self.deinterlace(raw))]*self.width*self.planes)
         else:
             pixels = self.iterboxed(self.iterstraight(raw))
+        return self.width, self.height, pixels, self.metadata()
+
+    def read_packed(self, lenient=False):
+        """
+        Read the PNG file like :meth:`read`, but leave each row in boxed
+        row packed format (as :meth:`Writer.write_packed` takes it):
+        samples of less than 8 bits are not unpacked, and 16 bit ones
+        are two bytes each.  Only straightlaced images can be read this
+        way.
+        """
+
+        self.preamble(lenient=lenient)
+        if self.interlace:
+            raise FormatError(
+              "Interlaced images can't be read in packed format.")
+        rows = self.iterstraight(self.idatdecomp(lenient))
+        return self.width, self.height, rows, self.metadata()
+
+    def metadata(self):
+        """The `metadata` dictionary returned by :meth:`read`."""
+
         meta = dict()
         for attr in 'greyscale alpha planes bitdepth interlace'.split():
             meta[attr] = getattr(self, attr)
@@ -1933,7 +2319,7 @@ class Reader:
                 meta[attr] = a
         if self.plte:
             meta['palette'] = self.palette()
-        return self.width, self.height, pixels, meta
+        return meta
 
 
     def read_flat(self):
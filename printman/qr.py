@@ -0,0 +1,145 @@
+"""QR codes linking to a game's play page, and a cache of their PNGs.
+
+Drawing a game's QR code is the slowest part of serving it, and the
+picture never changes for a given host and game key, so the PNGs are
+kept in two places: a size bounded LRU cache in this process, and in a
+SavedQR beside the game (see store.get_qr_png).  STATS counts how each
+request was served.
+"""
+import collections
+import cStringIO as StringIO
+import threading
+import time
+
+import printman.qrcode.exceptions as exceptions
+import printman.qrcode.main as qrcode
+
+QR_VERSION = 5
+QR_BOX_SIZE = 2
+
+# Hosts to keep a qrcode.PrefixBuilder for.  Each holds about 150KB.
+BUILDER_COUNT = 4
+
+# Total size of the PNGs kept in process.  A game's QR code is about
+# 300 bytes.
+CACHE_BYTES = 4 * 1024 * 1024
+
+
+def game_url(host, game_key):
+	return "http://%s/p/?g=%s" % (host, game_key)
+
+
+def make_qr(host, game_key):
+	"""The QR code for a game, made by a PrefixBuilder for `host`.
+
+	A URL too long for QR_VERSION gets the smallest version it fits.
+	"""
+	builder = _builders.get(host)
+	if builder is None:
+		builder = qrcode.PrefixBuilder(
+			game_url(host, ""), QR_VERSION, box_size=QR_BOX_SIZE, border=0)
+		_builders.put(host, builder)
+	try:
+		return builder.make(game_key)
+	except exceptions.DataOverflowError:
+		pass
+	qr = qrcode.QRCode(box_size=QR_BOX_SIZE, border=0, version=QR_VERSION)
+	qr.add_data(game_url(host, game_key))
+	qr.make()
+	return qr
+
+
+def render_png(host, game_key):
+	"""Draw the QR code for a game as PNG data, counting the time taken."""
+	start = time.time()
+	buf = StringIO.StringIO()
+	make_qr(host, game_key).make_image().save(buf)
+	STATS.generated(time.time() - start)
+	return buf.getvalue()
+
+
+class Stats(object):
+	"""Counts of QR codes served from each tier, and of those drawn."""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self.lock:
+			self.hits = 0
+			self.store_hits = 0
+			self.misses = 0
+			self.generation_time = 0.0
+
+	def hit(self):
+		with self.lock:
+			self.hits += 1
+
+	def store_hit(self):
+		with self.lock:
+			self.store_hits += 1
+
+	def generated(self, seconds):
+		with self.lock:
+			self.misses += 1
+			self.generation_time += seconds
+
+	def snapshot(self):
+		with self.lock:
+			return {
+				"hits": self.hits,
+				"store_hits": self.store_hits,
+				"misses": self.misses,
+				"generation_time": self.generation_time,
+				"cache_entries": len(CACHE),
+				"cache_bytes": CACHE.size,
+			}
+
+
+class PngCache(object):
+	"""A least recently used cache of strings, bounded by their total size.
+
+	Other values can be kept too, given `sizeof` to measure them.
+	"""
+
+	def __init__(self, max_bytes, sizeof=len):
+		self.max_bytes = max_bytes
+		self.sizeof = sizeof
+		self.size = 0
+		self.items = collections.OrderedDict()
+		self.lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.items)
+
+	def get(self, key):
+		with self.lock:
+			data = self.items.pop(key, None)
+			if data is not None:
+				self.items[key] = data
+			return data
+
+	def put(self, key, data):
+		size = self.sizeof(data)
+		if size > self.max_bytes:
+			return
+		with self.lock:
+			old = self.items.pop(key, None)
+			if old is not None:
+				self.size -= self.sizeof(old)
+			self.items[key] = data
+			self.size += size
+			while self.size > self.max_bytes:
+				_, evicted = self.items.popitem(last=False)
+				self.size -= self.sizeof(evicted)
+
+	def clear(self):
+		with self.lock:
+			self.items.clear()
+			self.size = 0
+
+
+CACHE = PngCache(CACHE_BYTES)
+_builders = PngCache(BUILDER_COUNT, lambda builder: 1)
+STATS = Stats()
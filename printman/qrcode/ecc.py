@@ -0,0 +1,68 @@
+"""
+Reed-Solomon error correction codewords for QR codes.
+
+The codewords for a block are the remainder of its data, as a
+polynomial over GF(256), divided by the generator polynomial for the
+number of codewords wanted.  That remainder is worked out a byte at a
+time as in a linear feedback shift register, keeping the register as a
+single int and looking up the generator multiplied by the feedback byte
+from a table made once per generator.
+"""
+import binascii
+
+from printman.qrcode import base
+
+_tables = {}
+
+
+def generator(ec_count):
+    """
+    The coefficients of the generator polynomial for `ec_count` error
+    correction codewords, highest power (always 1) first.
+    """
+    poly = [1]
+    for i in range(ec_count):
+        # Multiply by (x + a^i)
+        factor = base.gexp(i)
+        poly = [a ^ gf_mul(b, factor)
+                for a, b in zip(poly + [0], [0] + poly)]
+    return poly
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return base.gexp(base.glog(a) + base.glog(b))
+
+
+def feedback_table(ec_count):
+    """
+    For each feedback byte, the generator (without its leading term)
+    multiplied by that byte, packed into an int of `ec_count` bytes.
+    """
+    table = _tables.get(ec_count)
+    if table is None:
+        poly = generator(ec_count)[1:]
+        table = [0] * 256
+        for factor in range(1, 256):
+            value = 0
+            for coefficient in poly:
+                value = (value << 8) | gf_mul(coefficient, factor)
+            table[factor] = value
+        _tables[ec_count] = table
+    return table
+
+
+def remainder(data, ec_count):
+    """
+    The `ec_count` error correction codewords for `data` (a bytearray,
+    or a list of byte values) as a bytearray.
+    """
+    table = feedback_table(ec_count)
+    shift = 8 * (ec_count - 1)
+    mask = (1 << (8 * ec_count)) - 1
+    register = 0
+    for byte in data:
+        register = ((register << 8) & mask) ^ table[(register >> shift) ^ byte]
+    return bytearray(binascii.unhexlify('%0*x' % (2 * ec_count, register)))
+
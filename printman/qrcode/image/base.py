@@ -8,5 +8,15 @@ class BaseImage(object):
     def drawrect(self, row, col):
         raise NotImplementedError("BaseImage.drawrect")
 
+    def draw_modules(self, modules):
+        """
+        Draw every dark module of `modules`, a list of rows.  Images that
+        can fill a whole row at a time override this.
+        """
+        for r, line in enumerate(modules):
+            for c, dark in enumerate(line):
+                if dark:
+                    self.drawrect(r, c)
+
     def save(self, stream, kind=None):
         raise NotImplementedError("BaseImage.save")
@@ -1,30 +1,48 @@
-# Try to import PIL in either of the two ways it can be installed.
-import array
 import printman.png as png
 
 import printman.qrcode.image.base as base
 
 
 class PngImage(base.BaseImage):
-    """PIL image builder, default format is PNG."""
+    """1 bit greyscale PNG image builder.
+
+    Pixels are kept as one int per row, most significant bit first, with
+    set bits for white, which is how the PNG packs them."""
 
     def __init__(self, border, width, box_size):
         super(PngImage, self).__init__(border, width, box_size)
         self.kind = "PNG"
         self.pixelsize = (self.width + self.border * 2) * self.box_size
-        self.pixels = [array.array("c", "1" * self.pixelsize) for a in range(self.pixelsize)]
+        self.rows = [(1 << self.pixelsize) - 1] * self.pixelsize
 
     def drawrect(self, row, col):
         start_x = (col + self.border) * self.box_size
         start_y = (row + self.border) * self.box_size
+        box = (((1 << self.box_size) - 1) <<
+               (self.pixelsize - start_x - self.box_size))
         for y in range(start_y, start_y + self.box_size):
-            for x in range(start_x, start_x + self.box_size):
-                self.pixels[y][x] = "0"
+            self.rows[y] &= ~box
+
+    def draw_modules(self, modules):
+        # Each row of modules is scaled up to a row of pixels in one go,
+        # and used for all box_size rows of pixels it covers.
+        boxes = ("0" * self.box_size, "1" * self.box_size)
+        margin = self.border * self.box_size
+        for r, line in enumerate(modules):
+            dark = int("".join([boxes[1 if m else 0] for m in line]), 2)
+            dark <<= margin
+            start_y = (r + self.border) * self.box_size
+            for y in range(start_y, start_y + self.box_size):
+                self.rows[y] &= ~dark
+
+    def packed_rows(self):
+        """The rows as strings of packed bytes."""
+        return png.pack_rows(self.rows, self.pixelsize)
 
     def save(self, stream, kind=None):
         if kind is None:
             kind = self.kind
         assert kind == "PNG"
-        writer = png.Writer(width=self.pixelsize, height=self.pixelsize, 
+        writer = png.Writer(width=self.pixelsize, height=self.pixelsize,
                             alpha=False, greyscale=True, bitdepth=1)
-        writer.write(stream, self.pixels)
\ No newline at end of file
+        writer.write_packed(stream, self.packed_rows())
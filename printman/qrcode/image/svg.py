@@ -1,43 +1,61 @@
-import xml.etree.ElementTree as ET
-import printman.qrcode.image.base
+import re
 
+import printman.qrcode.image.base as base
 
-class SvgFragmentImage(qrcode.image.base.BaseImage):
+_DARK_RUNS = re.compile("1+")
+
+
+class SvgFragmentImage(base.BaseImage):
     """SVG image builder
 
     Creates a QR-code image as a SVG document fragment.
     Ignores the {box_size} parameter, making the QR-code boxes
-    1mm square."""
+    1mm square.
+
+    Horizontal runs of dark modules are drawn as one rect each, and the
+    document is written straight to the stream as it is saved."""
 
     _SVG_namespace = "http://www.w3.org/2000/svg"
 
     def __init__(self, border, width, box_size):
         super(SvgFragmentImage, self).__init__(border, width, box_size)
         self.kind = "SVG"
-        ET.register_namespace("svg", self._SVG_namespace)
-        self._img = self._svg()
+        # (row, col, length) of each run of dark modules, in order
+        self.runs = []
 
     def drawrect(self, row, col):
-        self._img.append(self._rect(row, col))
+        if self.runs:
+            last_row, last_col, length = self.runs[-1]
+            if last_row == row and last_col + length == col:
+                self.runs[-1] = (row, last_col, length + 1)
+                return
+        self.runs.append((row, col, 1))
+
+    def draw_modules(self, modules):
+        for r, line in enumerate(modules):
+            digits = "".join(["1" if m else "0" for m in line])
+            for match in _DARK_RUNS.finditer(digits):
+                self.runs.append((r, match.start(), match.end() - match.start()))
 
     def save(self, stream, kind=None):
         if kind is not None and kind != self.kind:
             raise ValueError("Cannot set SVG image type to " + kind)
         self._write(stream)
 
-    def _svg(self, tag = ET.QName(_SVG_namespace, "svg")):
+    def _svg(self, tag="svg:svg"):
         dimension = "%dmm" % (2 * self.border + self.width)
-        return ET.Element(tag, version="1.1",
-                          width=dimension, height=dimension)
+        return '<%s height="%s" version="1.1" width="%s" xmlns:svg="%s">' % (
+            tag, dimension, dimension, self._SVG_namespace)
 
-    def _rect(self, row, col, tag=ET.QName(_SVG_namespace, "rect")):
-        return ET.Element(tag,
-                          x="%dmm" % (self.border + col),
-                          y="%dmm" % (self.border + row),
-                          width="1mm", height="1mm")
+    def _rect(self, row, col, length, tag="svg:rect"):
+        return '<%s height="1mm" width="%dmm" x="%dmm" y="%dmm" />' % (
+            tag, length, self.border + col, self.border + row)
 
-    def _write(self, stream):
-        ET.ElementTree(self._img).write(stream, xml_declaration=False)
+    def _write(self, stream, tag="svg:svg"):
+        stream.write(self._svg())
+        for row, col, length in self.runs:
+            stream.write(self._rect(row, col, length))
+        stream.write("</%s>" % tag)
 
 
 class SvgImage(SvgFragmentImage):
@@ -45,17 +63,37 @@ class SvgImage(SvgFragmentImage):
 
     Creates a QR-code image as a standalone SVG document."""
 
-    def __init__(self, border, width, box_size):
-        super(SvgImage, self).__init__(border, width, box_size)
+    def _svg(self, tag="svg", extra=""):
+        dimension = "%dmm" % (2 * self.border + self.width)
+        return '<%s height="%s" version="1.1"%s width="%s" xmlns="%s">' % (
+            tag, dimension, extra, dimension, self._SVG_namespace)
 
-    def _svg(self):
-        svg = super(SvgImage, self)._svg(tag="svg")
-        svg.set("xmlns", self._SVG_namespace)
-        return svg
+    def _rect(self, row, col, length):
+        return super(SvgImage, self)._rect(row, col, length, tag="rect")
 
-    def _rect(self, row, col):
-        return super(SvgImage, self)._rect(row, col, tag="rect")
+    def _write(self, stream):
+        stream.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        super(SvgImage, self)._write(stream, tag="svg")
+
+
+class SvgPathImage(SvgImage):
+    """Standalone SVG image builder, drawing every dark module as part of
+    a single path
+
+    The document is given a viewBox of one unit per module, so the path
+    is the same size as the rects of SvgImage but a fraction of the
+    text."""
+
+    def _svg(self):
+        size = 2 * self.border + self.width
+        return super(SvgPathImage, self)._svg(
+            extra=' viewBox="0 0 %d %d"' % (size, size))
 
     def _write(self, stream):
-        ET.ElementTree(self._img).write(stream, encoding="UTF-8",
-                                        xml_declaration=True)
+        stream.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        stream.write(self._svg())
+        stream.write('<path d="')
+        for row, col, length in self.runs:
+            stream.write("M%d %dh%dv1h-%dz" % (
+                self.border + col, self.border + row, length, length))
+        stream.write('" fill="#000000" /></svg>')
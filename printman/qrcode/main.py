@@ -1,4 +1,4 @@
-from printman.qrcode import constants, exceptions, util
+from printman.qrcode import base, constants, exceptions, util
 from printman.qrcode.image.base import BaseImage
 
 
@@ -32,6 +32,7 @@ class QRCode:
         self.modules = None
         self.modules_count = 0
         self.data_cache = None
+        self._data_rows = None
         self.data_list = []
 
     def add_data(self, data):
@@ -55,30 +56,36 @@ class QRCode:
         self.makeImpl(False, self.best_mask_pattern())
 
     def makeImpl(self, test, mask_pattern):
-        self.modules_count = self.version * 4 + 17
-        self.modules = [None] * self.modules_count
-
-        for row in range(self.modules_count):
-
-            self.modules[row] = [None] * self.modules_count
+        rows = self.make_rows(test, mask_pattern)
+        width = self.modules_count
+        self.modules = [[bit == "1" for bit in bin(row)[2:].zfill(width)]
+                        for row in rows]
 
-            for col in range(self.modules_count):
-                self.modules[row][col] = None   # (col + row) % 3
-
-        self.setup_position_probe_pattern(0, 0)
-        self.setup_position_probe_pattern(self.modules_count - 7, 0)
-        self.setup_position_probe_pattern(0, self.modules_count - 7)
-        self.sutup_position_adjust_pattern()
-        self.setup_timing_pattern()
-        self.setup_type_info(test, mask_pattern)
-
-        if self.version >= 7:
-            self.setup_type_number(test)
+    def make_rows(self, test, mask_pattern):
+        """
+        Lay out the symbol with the given mask pattern, as one int per row
+        of modules (see ``util.row_bits``).
 
+        Everything but the data is taken from the ``Template`` for this
+        version and error correction level, so this is only a matter of
+        or-ing together rows built ahead of time.
+        """
+        self.modules_count = self.version * 4 + 17
         if self.data_cache is None:
             self.data_cache = util.create_data(
                 self.version, self.error_correction, self.data_list)
-        self.map_data(self.data_cache, mask_pattern)
+        template = Template.get(self.version, self.error_correction)
+        if self._data_rows is None or self._data_rows[0] is not self.data_cache:
+            self._data_rows = (self.data_cache,
+                               template.data_rows(self.data_cache))
+        data_rows = self._data_rows[1]
+        mask_rows = template.mask_rows(mask_pattern)
+        rows = [function | (data ^ mask) for function, data, mask
+                in zip(template.function_rows, data_rows, mask_rows)]
+        if not test:
+            rows = [row | info for row, info
+                    in zip(rows, template.info_rows(mask_pattern))]
+        return rows
 
     def setup_position_probe_pattern(self, row, col):
         for r in range(-1, 8):
@@ -121,9 +128,8 @@ class QRCode:
         pattern = 0
 
         for i in range(8):
-            self.makeImpl(True, i)
-
-            lost_point = util.lost_point(self.modules)
+            lost_point = util.lost_point_rows(self.make_rows(True, i),
+                                              self.modules_count)
 
             if i == 0 or min_lost_point > lost_point:
                 min_lost_point = lost_point
@@ -179,10 +185,7 @@ class QRCode:
                 image_factory = PngImage
 
         im = image_factory(self.border, self.modules_count, self.box_size)
-        for r in range(self.modules_count):
-            for c in range(self.modules_count):
-                if self.modules[r][c]:
-                    im.drawrect(r, c)
+        im.draw_modules(self.modules)
         return im
 
     def setup_timing_pattern(self):
@@ -261,47 +264,237 @@ class QRCode:
         # fixed module
         self.modules[self.modules_count - 8][8] = (not test)
 
-    def map_data(self, data, mask_pattern):
-        inc = -1
-        row = self.modules_count - 1
-        bitIndex = 7
-        byteIndex = 0
-
-        mask_func = util.mask_func(mask_pattern)
-
-        for col in range(self.modules_count - 1, -1, -2):
 
+class Template(object):
+    """
+    The parts of a symbol that are the same whatever data it holds.
+
+    The function patterns (finders, alignment and timing), the format
+    and version information for each mask pattern, and the masks
+    themselves are worked out once per version and error correction
+    level, and kept as row ints.  ``data_cells`` lists the modules left
+    over for data, in the order the codeword bits are placed in them:
+    up and down two module wide columns, from the right.
+    """
+
+    _cache = {}
+
+    @classmethod
+    def get(cls, version, error_correction):
+        key = (version, error_correction)
+        template = cls._cache.get(key)
+        if template is None:
+            template = cls._cache[key] = cls(version, error_correction)
+        return template
+
+    def __init__(self, version, error_correction):
+        self.version = version
+        self.error_correction = error_correction
+        self.modules_count = version * 4 + 17
+        qr = self._layout(True, 0)
+        self.function_rows = [util.row_bits([bool(m) for m in row])
+                              for row in qr.modules]
+
+        width = self.modules_count
+        self.data_cells = []
+        inc = -1
+        row = width - 1
+        for col in range(width - 1, -1, -2):
             if col == 6:
                 col -= 1
-
             while True:
-
                 for c in range(2):
+                    # col - c can be -1, which wraps round to the
+                    # (already filled) last column, so cells are marked
+                    # as taken to skip it.
+                    if qr.modules[row][col - c] is None:
+                        self.data_cells.append((row, col - c))
+                        qr.modules[row][col - c] = False
+                row += inc
+                if row < 0 or width <= row:
+                    row -= inc
+                    inc = -inc
+                    break
+        self._mask_rows = {}
+        self._info_rows = {}
 
-                    # Note that col - c looks like a dangerous range (col could
-                    # be 0, causing lookup of -1). However, this isn't possible
-                    # because self.modules_count is always odd so the last
-                    # range item will always be 1.
-                    if self.modules[row][col - c] is None:
-
-                        dark = False
-
-                        if byteIndex < len(data):
-                            dark = (((data[byteIndex] >> bitIndex) & 1) == 1)
-
-                        if mask_func(row, col - c):
-                            dark = not dark
+    def _layout(self, test, mask_pattern):
+        """
+        A QRCode with only the function patterns and format (and version)
+        information laid out, with ``None`` for the data modules.
+        """
+        qr = QRCode(version=self.version,
+                    error_correction=self.error_correction)
+        width = qr.modules_count = self.modules_count
+        qr.modules = [[None] * width for row in range(width)]
+        qr.setup_position_probe_pattern(0, 0)
+        qr.setup_position_probe_pattern(width - 7, 0)
+        qr.setup_position_probe_pattern(0, width - 7)
+        qr.sutup_position_adjust_pattern()
+        qr.setup_timing_pattern()
+        qr.setup_type_info(test, mask_pattern)
+        if self.version >= 7:
+            qr.setup_type_number(test)
+        return qr
 
-                        self.modules[row][col - c] = dark
-                        bitIndex -= 1
+    def _cell_bit(self, col):
+        return 1 << (self.modules_count - 1 - col)
 
-                        if bitIndex == -1:
-                            byteIndex += 1
-                            bitIndex = 7
+    def data_rows(self, data):
+        """
+        The bits of `data` (a list of codeword bytes) placed in the data
+        modules, unmasked.
+        """
+        rows = [0] * self.modules_count
+        limit = len(data) * 8
+        for i, (row, col) in enumerate(self.data_cells):
+            if i >= limit:
+                break
+            if (data[i >> 3] >> (7 - (i & 7))) & 1:
+                rows[row] |= self._cell_bit(col)
+        return rows
+
+    def mask_rows(self, mask_pattern):
+        """
+        The data modules that `mask_pattern` inverts.
+        """
+        rows = self._mask_rows.get(mask_pattern)
+        if rows is None:
+            mask_func = util.mask_func(mask_pattern)
+            rows = [0] * self.modules_count
+            for row, col in self.data_cells:
+                if mask_func(row, col):
+                    rows[row] |= self._cell_bit(col)
+            self._mask_rows[mask_pattern] = rows
+        return rows
+
+    def info_rows(self, mask_pattern):
+        """
+        The dark modules of the format and version information for a
+        symbol masked with `mask_pattern`.  (While trying out masks, these
+        are all left light.)
+        """
+        rows = self._info_rows.get(mask_pattern)
+        if rows is None:
+            modules = self._layout(False, mask_pattern).modules
+            rows = [util.row_bits([bool(m) for m in row]) & ~function
+                    for row, function in zip(modules, self.function_rows)]
+            self._info_rows[mask_pattern] = rows
+        return rows
+
+
+class PrefixBuilder(object):
+    """
+    Makes QR codes of one version for data that all starts with the same
+    `prefix`, such as links to pages on one site.
+
+    The data is written in 8 bit mode, as ``QRData`` picks for anything
+    with a lower case letter in it.  For each length of data the mode,
+    length and prefix bits are encoded once, and the first code made is
+    kept, packed into one int as ``util.symbol_bits`` does.  Later codes
+    of that length start from it, and only the codewords that differ
+    from it (the suffix and error correction, not the prefix or
+    padding) are placed.  Each mask is then scored on the packed symbol,
+    without laying out its rows.
+
+    Raises ValueError if `prefix` could be written in a more compact mode.
+    """
+
+    def __init__(self, prefix, version,
+                 error_correction=constants.ERROR_CORRECT_M, **kwargs):
+        if isinstance(prefix, unicode):
+            prefix = prefix.encode('utf-8')
+        if util.QRData(prefix).mode != util.MODE_8BIT_BYTE:
+            raise ValueError("Prefix %r isn't written in 8 bit mode" % prefix)
+        self.prefix = prefix
+        self.version = int(version)
+        self.error_correction = int(error_correction)
+        self.kwargs = kwargs
+        self.rs_blocks = base.rs_blocks(self.version, self.error_correction)
+        self.total_data_count = sum(block.data_count
+                                    for block in self.rs_blocks)
+        template = Template.get(self.version, self.error_correction)
+        width = self.modules_count = template.modules_count
+        stride = width + 1
+
+        # The packed symbol bit for each data module, a codeword at a
+        # time, most significant bit first.
+        cells = [1 << (stride * (width - 1 - row) + width - 1 - col)
+                 for row, col in template.data_cells]
+        self.codeword_cells = [cells[i:i + 8]
+                               for i in range(0, len(cells) - 7, 8)]
+        self.function_symbol = util.symbol_bits(template.function_rows, width)
+        self.mask_symbols = [
+            util.symbol_bits(template.mask_rows(i), width) for i in range(8)]
+        self._starts = {}
+
+    def _start(self, length):
+        """
+        The encoded mode, length and prefix for data of `length` bytes,
+        and the codewords and packed data modules of the first code of
+        that length (or None, before it's made).
+        """
+        start = self._starts.get(length)
+        if start is None:
+            buffer = util.BitBuffer()
+            buffer.put(util.MODE_8BIT_BYTE, 4)
+            buffer.put(length,
+                       util.length_in_bits(util.MODE_8BIT_BYTE, self.version))
+            buffer.put_bytes(self.prefix)
+            start = self._starts[length] = [
+                bytes(buffer.buffer), len(buffer), None, None]
+        return start
+
+    def make(self, suffix):
+        """
+        A QRCode for `prefix` + `suffix`, made as ``QRCode.make`` would.
 
-                row += inc
+        Raises DataOverflowError if it doesn't fit in `version`.
+        """
+        if isinstance(suffix, unicode):
+            suffix = suffix.encode('utf-8')
+        data = self.prefix + suffix
+        start = self._start(len(data))
+        buffer = util.BitBuffer()
+        buffer.buffer = bytearray(start[0])
+        buffer.length = start[1]
+        buffer.put_bytes(suffix)
+        util.finish_buffer(buffer, self.total_data_count)
+        data_cache = util.create_bytes(buffer, self.rs_blocks)
+
+        width = self.modules_count
+        if start[2] is None:
+            template = Template.get(self.version, self.error_correction)
+            symbol = util.symbol_bits(template.data_rows(data_cache), width)
+            start[2:] = data_cache, symbol
+        else:
+            symbol = start[3]
+            for old, new, cells in zip(start[2], data_cache,
+                                       self.codeword_cells):
+                changed = old ^ new
+                if changed:
+                    for i in range(8):
+                        if changed & (0x80 >> i):
+                            symbol ^= cells[i]
+
+        # As QRCode.best_mask_pattern: the first of the lowest scores.
+        pattern = 0
+        min_lost_point = None
+        for i, mask in enumerate(self.mask_symbols):
+            lost_point = util.lost_point_symbol(
+                self.function_symbol | (symbol ^ mask), width)
+            if min_lost_point is None or lost_point < min_lost_point:
+                min_lost_point = lost_point
+                pattern = i
 
-                if row < 0 or self.modules_count <= row:
-                    row -= inc
-                    inc = -inc
-                    break
+        qr = QRCode(version=self.version,
+                    error_correction=self.error_correction, **self.kwargs)
+        qr.add_data(util.QRData(data, mode=util.MODE_8BIT_BYTE))
+        qr.data_cache = data_cache
+        stride = width + 1
+        full = (1 << width) - 1
+        qr._data_rows = (data_cache, [
+            (symbol >> (stride * (width - 1 - row))) & full
+            for row in range(width)])
+        qr.makeImpl(False, pattern)
+        return qr
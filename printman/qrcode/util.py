@@ -1,7 +1,9 @@
+import binascii
 import re
 import math
 
 import printman.qrcode.base as base
+import printman.qrcode.ecc as ecc
 import printman.qrcode.exceptions as exceptions
 
 # QR encoding modes.
@@ -157,87 +159,147 @@ def length_in_bits(mode, version):
     return mode_size[mode]
 
 
+# Turns a bytearray of 0s and 1s into a string of "0" and "1" digits.
+_BIT_DIGITS = "01" + "".join(chr(i) for i in range(2, 256))
+
+
+def row_bits(row):
+    """
+    Pack a row of modules into an int, with a set bit for each dark
+    module and the first module as the most significant bit.
+    """
+    return int(str(bytearray(row)).translate(_BIT_DIGITS), 2)
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
 def lost_point(modules):
-    modules_count = len(modules)
+    return lost_point_rows([row_bits(row) for row in modules], len(modules))
+
+
+_symbol_masks = {}
+
+
+def _symbol_masks_for(modules_count):
+    """
+    Masks over a whole symbol packed by ``lost_point_rows``, each a row
+    mask repeated over a range of rows.
+    """
+    masks = _symbol_masks.get(modules_count)
+    if masks is None:
+        stride = modules_count + 1
+        full = (1 << modules_count) - 1
+
+        def spread(row_mask, first=0, last=modules_count):
+            return sum(row_mask << (stride * (modules_count - 1 - row))
+                       for row in range(first, last))
+
+        # Columns that have a neighbour to their right, and to their left
+        has_right = full >> 1
+        has_left = full & ~1
+        masks = _symbol_masks[modules_count] = {
+            "full": spread(full),
+            "has_right": spread(has_right),
+            "has_left": spread(has_left),
+            # Rows with a row above them, and below them
+            "up": spread(full, 1),
+            "up_right": spread(has_right, 1),
+            "up_left": spread(has_left, 1),
+            "down": spread(full, 0, modules_count - 1),
+            "down_right": spread(has_right, 0, modules_count - 1),
+            "down_left": spread(has_left, 0, modules_count - 1),
+            "starts": spread(full >> 6),
+            "columns": spread(full, 0, modules_count - 6),
+        }
+    return masks
+
+
+def symbol_bits(rows, modules_count):
+    """
+    Pack a symbol given as one int per row of modules (see ``row_bits``)
+    into one int, a row at a time with a light guard bit between them,
+    the first row most significant.
+    """
+    stride = modules_count + 1
+    symbol = 0
+    for row in rows:
+        symbol = (symbol << stride) | row
+    return symbol
+
+
+def lost_point_rows(rows, modules_count):
+    """
+    The mask penalty score of a symbol given as one int per row of
+    modules (see ``row_bits``).
+    """
+    return lost_point_symbol(symbol_bits(rows, modules_count), modules_count)
+
+
+def lost_point_symbol(symbol, modules_count):
+    """
+    The mask penalty score of a symbol packed by ``symbol_bits``.
+
+    Packed that way, each penalty is worked out for the whole symbol
+    with a handful of bitwise operations rather than module by module.
+    """
+    stride = modules_count + 1
+    masks = _symbol_masks_for(modules_count)
+    up = symbol >> stride
+    down = symbol << stride
 
     lost_point = 0
 
-    # LEVEL1
-
-    for row in range(modules_count):
-
-        for col in range(modules_count):
-
-            sameCount = 0
-            dark = modules[row][col]
-
-            for r in range(-1, 2):
-
-                if row + r < 0 or modules_count <= row + r:
-                    continue
-
-                for c in range(-1, 2):
-
-                    if col + c < 0 or modules_count <= col + c:
-                        continue
-                    if r == 0 and c == 0:
-                        continue
-
-                    if dark == modules[row + r][col + c]:
-                        sameCount += 1
-            if sameCount > 5:
-                lost_point += (3 + sameCount - 5)
-
-    # LEVEL2
-
-    for row in range(modules_count - 1):
-        for col in range(modules_count - 1):
-            count = 0
-            if modules[row][col]:
-                count += 1
-            if modules[row + 1][col]:
-                count += 1
-            if modules[row][col + 1]:
-                count += 1
-            if modules[row + 1][col + 1]:
-                count += 1
-            if count == 0 or count == 4:
-                lost_point += 3
-
-    # LEVEL3
-
-    for row in range(modules_count):
-        for col in range(modules_count - 6):
-            if (modules[row][col]
-                    and not modules[row][col + 1]
-                    and modules[row][col + 2]
-                    and modules[row][col + 3]
-                    and modules[row][col + 4]
-                    and not modules[row][col + 5]
-                    and modules[row][col + 6]):
-                lost_point += 40
-
-    for col in range(modules_count):
-        for row in range(modules_count - 6):
-            if (modules[row][col]
-                    and not modules[row + 1][col]
-                    and modules[row + 2][col]
-                    and modules[row + 3][col]
-                    and modules[row + 4][col]
-                    and not modules[row + 5][col]
-                    and modules[row + 6][col]):
-                lost_point += 40
+    # LEVEL1: modules with more than five of their (up to eight)
+    # neighbours the same colour as themselves.  The neighbours that
+    # match are added up module-wise in a 4 bit counter held as four
+    # ints (s0 being the ones bit of every module).
+
+    s0 = s1 = s2 = s3 = 0
+    for bits, valid in ((symbol >> 1, masks["has_right"]),
+                        (symbol << 1, masks["has_left"]),
+                        (up, masks["up"]),
+                        (up >> 1, masks["up_right"]),
+                        (up << 1, masks["up_left"]),
+                        (down, masks["down"]),
+                        (down >> 1, masks["down_right"]),
+                        (down << 1, masks["down_left"])):
+        carry = ~(symbol ^ bits) & valid
+        s0, carry = s0 ^ carry, s0 & carry
+        s1, carry = s1 ^ carry, s1 & carry
+        s2, carry = s2 ^ carry, s2 & carry
+        s3 |= carry
+    # Same count of 6, 7 or 8, which scores (3 + same count - 5)
+    over = s3 | (s2 & s1)
+    if over:
+        lost_point += (popcount(s0 & over) + 2 * popcount(s1 & over) +
+                       4 * popcount(s2 & over) + 8 * popcount(s3 & over) -
+                       2 * popcount(over))
+
+    # LEVEL2: 2x2 blocks of one colour.
+
+    dark = symbol & (symbol >> 1) & down & (down >> 1)
+    light = ~(symbol | (symbol >> 1) | down | (down >> 1))
+    lost_point += 3 * popcount((dark | light) & masks["down_right"])
+
+    # LEVEL3: 1:1:3:1:1 dark:light:dark:light:dark runs, across and
+    # down.
+
+    found = (symbol & ~(symbol >> 1) & (symbol >> 2) & (symbol >> 3) &
+             (symbol >> 4) & ~(symbol >> 5) & (symbol >> 6) & masks["starts"])
+    lost_point += 40 * popcount(found)
+
+    found = (symbol & ~down & (down << stride) & (down << 2 * stride) &
+             (down << 3 * stride) & ~(down << 4 * stride) &
+             (down << 5 * stride) & masks["columns"])
+    lost_point += 40 * popcount(found)
 
     # LEVEL4
 
-    darkCount = 0
+    darkCount = popcount(symbol)
 
-    for col in range(modules_count):
-        for row in range(modules_count):
-            if modules[row][col]:
-                darkCount += 1
-
-    ratio = abs(100 * darkCount / modules_count / modules_count - 50) / 5
+    ratio = abs(100 * darkCount // modules_count // modules_count - 50) // 5
     lost_point += ratio * 10
 
     return lost_point
@@ -301,100 +363,104 @@ class QRData:
                 else:
                     buffer.put(ALPHA_NUM.find(chars), 6)
         else:
-            for c in self.data:
-                buffer.put(ord(c), 8)
+            buffer.put_bytes(self.data)
 
     def __repr__(self):
         return self.data
 
 
 class BitBuffer:
+    """
+    Bits packed most significant first into ``buffer``, a bytearray that
+    is always as long as is needed to hold ``length`` bits.  The unused
+    low bits of a partly filled last byte are zero.
+    """
 
     def __init__(self):
-        self.buffer = []
+        self.buffer = bytearray()
         self.length = 0
 
     def __repr__(self):
         return ".".join([str(n) for n in self.buffer])
 
     def get(self, index):
-        buf_index = math.floor(index / 8)
-        return ((self.buffer[buf_index] >> (7 - index % 8)) & 1) == 1
+        return ((self.buffer[index >> 3] >> (7 - index % 8)) & 1) == 1
 
     def put(self, num, length):
-        for i in range(length):
-            self.put_bit(((num >> (length - i - 1)) & 1) == 1)
+        """
+        Append the lowest `length` bits of `num`.
+        """
+        if length <= 0:
+            return
+        num &= (1 << length) - 1
+        used = self.length & 7
+        self.length += length
+        if used:
+            # Top up the partly filled last byte.
+            free = 8 - used
+            if length <= free:
+                self.buffer[-1] |= num << (free - length)
+                return
+            length -= free
+            self.buffer[-1] |= num >> length
+            num &= (1 << length) - 1
+        whole, rest = divmod(length, 8)
+        if whole:
+            self.buffer.extend(binascii.unhexlify(
+                '%0*x' % (2 * whole, num >> rest)))
+        if rest:
+            self.buffer.append((num << (8 - rest)) & 0xff)
+
+    def put_bytes(self, data):
+        """
+        Append the bytes of the string (or bytearray) `data`.
+        """
+        if not self.length & 7:
+            self.buffer.extend(data)
+            self.length += 8 * len(data)
+        elif data:
+            self.put(int(binascii.hexlify(data), 16), 8 * len(data))
 
     def __len__(self):
         return self.length
 
     def put_bit(self, bit):
-        buf_index = self.length // 8
-        if len(self.buffer) <= buf_index:
-            self.buffer.append(0)
-        if bit:
-            self.buffer[buf_index] |= (0x80 >> (self.length % 8))
-        self.length += 1
+        self.put(1 if bit else 0, 1)
 
 
 def create_bytes(buffer, rs_blocks):
+    """
+    Split the buffer of data codewords into `rs_blocks`, add the error
+    correction codewords for each block, and interleave the lot.
+    """
+    dcdata = []
+    ecdata = []
     offset = 0
-
-    maxDcCount = 0
-    maxEcCount = 0
-
-    dcdata = [0] * len(rs_blocks)
-    ecdata = [0] * len(rs_blocks)
-
-    for r in range(len(rs_blocks)):
-
-        dcCount = rs_blocks[r].data_count
-        ecCount = rs_blocks[r].total_count - dcCount
-
-        maxDcCount = max(maxDcCount, dcCount)
-        maxEcCount = max(maxEcCount, ecCount)
-
-        dcdata[r] = [0] * dcCount
-
-        for i in range(len(dcdata[r])):
-            dcdata[r][i] = 0xff & buffer.buffer[i + offset]
-        offset += dcCount
-
-        # Get error correction polynomial.
-        rsPoly = base.Polynomial([1], 0)
-        for i in range(ecCount):
-            rsPoly = rsPoly * base.Polynomial([1, base.gexp(i)], 0)
-
-        rawPoly = base.Polynomial(dcdata[r], len(rsPoly) - 1)
-
-        modPoly = rawPoly % rsPoly
-        ecdata[r] = [0] * (len(rsPoly) - 1)
-        for i in range(len(ecdata[r])):
-            modIndex = i + len(modPoly) - len(ecdata[r])
-            if (modIndex >= 0):
-                ecdata[r][i] = modPoly[modIndex]
-            else:
-                ecdata[r][i] = 0
-
-    totalCodeCount = 0
     for rs_block in rs_blocks:
-        totalCodeCount += rs_block.total_count
-
-    data = [None] * totalCodeCount
-    index = 0
-
-    for i in range(maxDcCount):
-        for r in range(len(rs_blocks)):
-            if i < len(dcdata[r]):
-                data[index] = dcdata[r][i]
-                index += 1
-
-    for i in range(maxEcCount):
-        for r in range(len(rs_blocks)):
-            if i < len(ecdata[r]):
-                data[index] = ecdata[r][i]
-                index += 1
-
+        dcCount = rs_block.data_count
+        ecCount = rs_block.total_count - dcCount
+        block = buffer.buffer[offset:offset + dcCount]
+        offset += dcCount
+        dcdata.append(block)
+        ecdata.append(ecc.remainder(block, ecCount))
+
+    # Codewords are interleaved a column of blocks at a time: the first
+    # codeword of every block, then the second, and so on.  Where blocks
+    # differ in length, the longer ones come last.
+    dcTotal = offset
+    shortDcCount = min(len(block) for block in dcdata)
+    ecTotal = sum(len(block) for block in ecdata)
+    count = len(rs_blocks)
+
+    data = bytearray(dcTotal + ecTotal)
+    extra = dcTotal - shortDcCount * count
+    for r, block in enumerate(dcdata):
+        data[r:shortDcCount * count:count] = block[:shortDcCount]
+        if len(block) > shortDcCount:
+            data[dcTotal - extra] = block[shortDcCount]
+            extra -= 1
+    for r, block in enumerate(ecdata):
+        data[dcTotal + r::count] = block
     return data
 
 
@@ -402,6 +468,16 @@ def create_data(version, error_correction, data_list):
 
     rs_blocks = base.rs_blocks(version, error_correction)
 
+    # calc num max data.
+    total_data_count = 0
+    for block in rs_blocks:
+        total_data_count += block.data_count
+
+    buffer = _data_buffer(version, data_list, total_data_count)
+    return create_bytes(buffer, rs_blocks)
+
+
+def _data_buffer(version, data_list, total_data_count):
     buffer = BitBuffer()
 
     for data in data_list:
@@ -410,11 +486,15 @@ def create_data(version, error_correction, data_list):
             length_in_bits(data.mode, version))
         data.write(buffer)
 
-    # calc num max data.
-    total_data_count = 0
-    for block in rs_blocks:
-        total_data_count += block.data_count
+    finish_buffer(buffer, total_data_count)
+    return buffer
 
+
+def finish_buffer(buffer, total_data_count):
+    """
+    Add the end code and padding to a buffer of encoded data, filling
+    it to `total_data_count` bytes.
+    """
     if len(buffer) > total_data_count * 8:
         raise exceptions.DataOverflowError("Code length overflow. Data size "
             "(%s) > size available (%s)" % (len(buffer), total_data_count * 8))
@@ -424,17 +504,9 @@ def create_data(version, error_correction, data_list):
         buffer.put(0, 4)
 
     # padding
-    while len(buffer) % 8:
-        buffer.put_bit(False)
+    buffer.put(0, -len(buffer) % 8)
 
     # padding
-    while True:
-        if len(buffer) >= total_data_count * 8:
-            break
-        buffer.put(PAD0, 8)
-
-        if len(buffer) >= total_data_count * 8:
-            break
-        buffer.put(PAD1, 8)
-
-    return create_bytes(buffer, rs_blocks)
+    pad_count = total_data_count - len(buffer) // 8
+    buffer.put_bytes((chr(PAD0) + chr(PAD1)) * (pad_count // 2) +
+                     chr(PAD0) * (pad_count % 2))
@@ -0,0 +1,377 @@
+"""Draw a whole edition as a single 1-bit image.
+
+templates/draw.html builds an edition out of one absolutely placed <img>
+per pill, pacman, monster and score digit, on top of the board, logo and
+QR code, so printing it costs dozens of requests back to the app.  This
+module puts the same pictures in the same places on one canvas, which
+is then sent as a single PNG.
+
+Only a few cells change from one turn to the next, so render_edition
+keeps each game's last picture and redraws just the parts that differ
+(see Scene.redraw).
+
+Pictures are held as lists of Python ints, one per row, with the most
+significant bit as the leftmost pixel and set bits for white, which is
+also how a 1-bit greyscale PNG packs its rows.
+"""
+import marshal
+import os
+import zlib
+
+import assets
+import game
+import gfx
+import png
+import qr as qr_codes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, "static")
+
+# The .logo box in draw.html, which the logo is centred in
+LOGO_BOX_HEIGHT = 46
+
+# Images with partial transparency or grey levels are cut to 1 bit here
+THRESHOLD = 128
+
+# Total size of the frames render_edition keeps.  An edition is about
+# 4KB compressed.
+FRAME_CACHE_BYTES = 2 * 1024 * 1024
+
+
+class Sprite(object):
+	"""A 1-bit picture, with a mask of the pixels that are drawn."""
+
+	__slots__ = ("width", "height", "rows", "mask")
+
+	def __init__(self, width, height, rows, mask=None):
+		self.width = width
+		self.height = height
+		self.rows = rows
+		if mask is None:
+			mask = [(1 << width) - 1] * height
+		self.mask = mask
+
+	@classmethod
+	def from_modules(cls, modules, box_size=qr_codes.QR_BOX_SIZE):
+		"""From a QR code's module matrix, `box_size` pixels per module."""
+		rows = []
+		for line in modules:
+			row = int("".join(("0" if m else "1") * box_size for m in line), 2)
+			rows.extend([row] * box_size)
+		return cls(len(modules[0]) * box_size, len(rows), rows)
+
+	@classmethod
+	def from_png(cls, path=None, data=None):
+		"""From the PNG file at `path`, or the PNG data `data`."""
+		if path is not None:
+			reader = png.Reader(filename=path)
+		else:
+			reader = png.Reader(bytes=data)
+		sprite = cls._from_1bit_png(reader)
+		if sprite is not None:
+			return sprite
+		width, height, pixels, meta = reader.asRGBA8()
+		rows = []
+		mask = []
+		for line in pixels:
+			row = opaque = 0
+			for i in range(0, width * 4, 4):
+				row <<= 1
+				opaque <<= 1
+				if line[i + 3] >= THRESHOLD:
+					opaque |= 1
+					if (line[i] * 299 + line[i + 1] * 587 + line[i + 2] * 114) >= THRESHOLD * 1000:
+						row |= 1
+			rows.append(row)
+			mask.append(opaque)
+		return cls(width, height, rows, mask)
+
+
+	@classmethod
+	def _from_1bit_png(cls, reader):
+		"""From a 1-bit greyscale PNG, as qr and gfx write them, without
+		going through RGBA; None for any other kind."""
+		reader.preamble()
+		if not (reader.greyscale and reader.bitdepth == 1 and not reader.alpha
+				and reader.trns is None and not reader.interlace):
+			return None
+		width, height, pixels, meta = reader.read_packed()
+		return cls(width, height, png.unpack_rows(pixels, width))
+
+
+_sprites = {}
+
+
+def sprite(path):
+	"""Load, and keep, the picture at `path`."""
+	image = _sprites.get(path)
+	if image is None:
+		image = _sprites[path] = Sprite.from_png(path)
+	return image
+
+
+def board_sprite(board_cls, page_width, name):
+	"""One of the pictures gfx.py draws for `board_cls` on a page
+	`page_width` pixels wide, from assets.
+
+	Sprites come straight from the board's SpriteAtlas.
+	"""
+	key = (board_cls.__name__, page_width, name)
+	image = _sprites.get(key)
+	if image is None:
+		if name in assets.SPRITE_NAMES:
+			atlas = assets.atlas(board_cls, page_width)
+			rows, mask = atlas.sprites[name]
+			image = Sprite(atlas.size, atlas.size, rows, mask)
+		else:
+			data = assets.get(board_cls, page_width, name).data
+			image = Sprite.from_png(data=data)
+		_sprites[key] = image
+	return image
+
+
+def static_sprite(name):
+	return sprite(os.path.join(STATIC_DIR, "%s.png" % name))
+
+
+class Canvas(object):
+
+	__slots__ = ("width", "height", "rows")
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.rows = [(1 << width) - 1] * height
+
+	def blit(self, sprite, x, y, clip=None):
+		"""Draw `sprite` with its top left corner at (x, y).
+
+		Only the part inside the canvas, and inside `clip` (a box of
+		left, top, right and bottom edges) if given, is drawn.
+		"""
+		left, top, right, bottom = clip or (0, 0, self.width, self.height)
+		left, top = max(left, 0), max(top, 0)
+		right, bottom = min(right, self.width), min(bottom, self.height)
+		if left >= right:
+			return
+		window = ((1 << (right - left)) - 1) << (self.width - right)
+		shift = self.width - x - sprite.width
+		rows = self.rows
+		for i in range(max(top - y, 0), min(bottom - y, sprite.height)):
+			if shift >= 0:
+				bits = sprite.rows[i] << shift
+				mask = (sprite.mask[i] << shift) & window
+			else:
+				bits = sprite.rows[i] >> -shift
+				mask = (sprite.mask[i] >> -shift) & window
+			rows[y + i] = (rows[y + i] & ~mask) | (bits & mask)
+
+	def blit_centred(self, sprite, left, top, width, height):
+		"""Draw `sprite` centred in, and cut to, the given box."""
+		self.blit(sprite, left + (width - sprite.width) // 2,
+				  top + (height - sprite.height) // 2,
+				  (left, top, left + width, top + height))
+
+	def fill(self, box):
+		"""Clear the box of left, top, right and bottom edges to white."""
+		left, top, right, bottom = box
+		window = ((1 << (right - left)) - 1) << (self.width - right)
+		rows = self.rows
+		for y in range(top, bottom):
+			rows[y] |= window
+
+	def packed_rows(self):
+		"""The rows as strings of packed bytes, for png.Writer.write_packed."""
+		return png.pack_rows(self.rows, self.width)
+
+	def write(self, outfile):
+		writer = png.Writer(width=self.width, height=self.height,
+							greyscale=True, bitdepth=1)
+		writer.write_packed(outfile, self.packed_rows())
+
+
+def intersect(a, b):
+	"""The overlap of two boxes, or None if they don't overlap."""
+	left, top = max(a[0], b[0]), max(a[1], b[1])
+	right, bottom = min(a[2], b[2]), min(a[3], b[3])
+	if left >= right or top >= bottom:
+		return None
+	return (left, top, right, bottom)
+
+
+class Scene(object):
+	"""The blits that draw a picture, in order.
+
+	Each blit has a key of (source, x, y, width, height, clip), where
+	source names the sprite, so that two scenes can be compared without
+	their sprites.
+	"""
+
+	__slots__ = ("width", "height", "blits")
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		# (key, sprite, area) for each blit
+		self.blits = []
+
+	def blit(self, source, sprite, x, y, clip=None):
+		key = (source, x, y, sprite.width, sprite.height, clip)
+		self.blits.append((key, sprite, self.area(key)))
+
+	def blit_centred(self, source, sprite, left, top, width, height):
+		self.blit(source, sprite, left + (width - sprite.width) // 2,
+				  top + (height - sprite.height) // 2,
+				  (left, top, left + width, top + height))
+
+	def keys(self):
+		return [blit[0] for blit in self.blits]
+
+	def area(self, key):
+		"""The box of the canvas a blit can change, or None."""
+		source, x, y, width, height, clip = key
+		box = intersect((x, y, x + width, y + height), (0, 0, self.width, self.height))
+		if box is not None and clip is not None:
+			box = intersect(box, clip)
+		return box
+
+	def draw(self):
+		canvas = Canvas(self.width, self.height)
+		for (source, x, y, width, height, clip), sprite, area in self.blits:
+			canvas.blit(sprite, x, y, clip)
+		return canvas
+
+	def redraw(self, canvas, keys):
+		"""Turn `canvas`, drawn from a scene with the given keys, into
+		this scene, or return None if it's too different.
+
+		Every box a blit in only one of the two scenes covers is cleared
+		and has all of this scene's blits that reach it drawn again, in
+		order, so it ends up as draw() would leave it.
+		"""
+		if (canvas.width, canvas.height) != (self.width, self.height):
+			return None
+		new_keys = self.keys()
+		if not keys or keys[0] != new_keys[0]:
+			# A different backdrop: start again
+			return None
+		old, new = set(keys), set(new_keys)
+		if len(old) != len(keys) or len(new) != len(new_keys):
+			# The same blit twice, which a set of changes can't describe
+			return None
+		dirty = [self.area(key) for key in old ^ new]
+		for box in dirty:
+			if box is None:
+				continue
+			canvas.fill(box)
+			left, top, right, bottom = box
+			for (source, x, y, width, height, clip), sprite, area in self.blits:
+				if (area is not None and area[0] < right and left < area[2] and
+						area[1] < bottom and top < area[3]):
+					canvas.blit(sprite, x, y, intersect(area, box))
+		return canvas
+
+
+def draw_number(scene, number, x, y):
+	for digit in str(number):
+		name = os.path.join("bold", digit)
+		image = static_sprite(name)
+		scene.blit(("static", name), image, x, y)
+		x += image.width
+
+
+def edition_scene(board, page_width, qr=None):
+	"""The Scene that draws `board` as draw.html would lay it out on a
+	page `page_width` pixels wide (main.PAGE_WIDTH).
+
+	`qr` is a Sprite of the game's QR code, or None to leave it out.
+	Finished games are drawn on MetaBoard with the "won" or "game_over"
+	picture, as Page.render_board does.
+	"""
+	image = {game.WON: "won", game.GAME_OVER: "game_over"}.get(board.mode)
+	layout = game.MetaBoard if image else type(board)
+	cell_size = page_width // layout.WIDTH
+
+	def xpos(x):
+		return cell_size * x
+
+	def ypos(y):
+		return gfx.LOGO_HEIGHT + (2 * cell_size) + y * cell_size
+
+	def board_blit(board_cls, name, x, y):
+		scene.blit(("board", board_cls.__name__, name),
+				   board_sprite(board_cls, page_width, name), x, y)
+
+	backdrop = board_sprite(layout, page_width, "board")
+	scene = Scene(page_width, backdrop.height)
+	board_blit(layout, "board", 0, 0)
+	scene.blit_centred(("static", "logo"), static_sprite("logo"), cell_size, cell_size,
+					   cell_size * (layout.WIDTH - 2), LOGO_BOX_HEIGHT)
+	if image:
+		scene.blit_centred(("static", image), static_sprite(image), xpos(1), ypos(1),
+						   cell_size * (layout.WIDTH - 2),
+						   cell_size * (layout.HEIGHT - 2))
+	else:
+		board_cls = type(board)
+		bits = board.pill_bits
+		for cell in board.PILL_CELLS:
+			if bits[cell >> 3] & (1 << (cell & 7)):
+				x, y = board.COORDS[cell]
+				board_blit(board_cls, "pill", xpos(x), ypos(y))
+		x, y = board.position
+		board_blit(board_cls, "pacman.%s" % board.dirn_str, xpos(x), ypos(y))
+		for monster in board.monsters.itervalues():
+			x, y = monster.position
+			name = "monster.%s" % monster.dirn_str
+			# Named after the monster too, as their drawing order matters
+			# where they overlap.
+			scene.blit(("monster", monster.type, name),
+					   board_sprite(board_cls, page_width, name), xpos(x), ypos(y))
+	footer = ypos(layout.HEIGHT + 1)
+	scene.blit(("static", "score"), static_sprite("score"), 30, footer + 5)
+	draw_number(scene, board.score, 92, footer + 5)
+	draw_number(scene, board.turn, 83, footer + 24)
+	if qr is not None:
+		scene.blit(("qr", hash(tuple(qr.rows))), qr,
+				   xpos(layout.WIDTH - 1) - gfx.QR_SIZE, ypos(layout.HEIGHT))
+	return scene
+
+
+def draw_edition(board, page_width, qr=None):
+	"""Draw `board` as draw.html would lay it out (see edition_scene)."""
+	return edition_scene(board, page_width, qr).draw()
+
+
+def dump_frame(canvas, keys):
+	"""A string holding `canvas` and the keys of the scene it shows."""
+	return zlib.compress(marshal.dumps((canvas.width, canvas.height, canvas.rows, keys)), 1)
+
+
+def load_frame(frame):
+	"""The canvas and keys from dump_frame."""
+	width, height, rows, keys = marshal.loads(zlib.decompress(frame))
+	canvas = Canvas(width, height)
+	canvas.rows = rows
+	return canvas, keys
+
+
+# Each game's last edition, by (game key, turn)
+FRAMES = qr_codes.PngCache(FRAME_CACHE_BYTES)
+
+
+def render_edition(game_key, board, page_width, qr=None):
+	"""draw_edition, starting from the picture of the game's last turn.
+
+	If there's a picture in FRAMES for this turn or the one before, only
+	the parts of it that have changed are drawn again; otherwise the
+	whole edition is drawn.  The result is kept for the next turn.
+	"""
+	scene = edition_scene(board, page_width, qr)
+	canvas = None
+	frame = FRAMES.get((game_key, board.turn)) or FRAMES.get((game_key, board.turn - 1))
+	if frame is not None:
+		canvas = scene.redraw(*load_frame(frame))
+	if canvas is None:
+		canvas = scene.draw()
+	FRAMES.put((game_key, board.turn), dump_frame(canvas, scene.keys()))
+	return canvas
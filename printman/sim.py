@@ -0,0 +1,327 @@
+"""Batch simulation of many games of the same board.
+
+A GameBatch holds N games in struct-of-arrays form and advances all of
+them a turn at a time with NumPy, giving exactly the same results as
+calling Board.do_turn on each game in turn.
+
+Run this module directly to check it against the scalar engine:
+
+	python -m printman.sim
+"""
+import random
+import sys
+import time
+
+import numpy
+
+import printman.game as game
+
+
+NO_CELL = -1
+# Bigger than any (distance, x, y) key built by GameBatch.closest.
+NO_OPTION = numpy.iinfo(numpy.int64).max
+
+
+class GameBatch(object):
+
+	def __init__(self, board_cls, size, monster_types):
+		board_cls.setup()
+		self.board_cls = board_cls
+		self.size = size
+		self.monster_types = tuple(monster_types)
+		self.setup_tables()
+
+		count = len(self.monster_types)
+		self.cell = numpy.zeros(size, numpy.int32)
+		self.dirn = numpy.zeros(size, numpy.int8)
+		self.turn = numpy.zeros(size, numpy.int64)
+		self.score = numpy.zeros(size, numpy.int64)
+		self.mode = numpy.zeros(size, numpy.int8)
+		self.pills = numpy.zeros((size, len(board_cls.PILL_BITS)), numpy.uint8)
+		self.pill_count = numpy.zeros(size, numpy.int32)
+		self.monster_cell = numpy.zeros((size, count), numpy.int32)
+		self.monster_dirn = numpy.zeros((size, count), numpy.int8)
+		self.monster_mode = numpy.zeros((size, count), numpy.int8)
+		self.monster_mode_time = numpy.zeros((size, count), numpy.int64)
+
+	def setup_tables(self):
+		cls = self.board_cls
+		self.x = numpy.array([x for x, y in cls.COORDS], numpy.int64)
+		self.y = numpy.array([y for x, y in cls.COORDS], numpy.int64)
+		self.steps = numpy.array(cls.STEPS, numpy.int32)
+		self.warp_targets = numpy.array(cls.WARP_TARGETS, numpy.int32)
+		self.exit_targets = numpy.array(cls.EXIT_TARGETS, numpy.int32)
+		self.neighbours = self._padded(cls.NEIGHBOURS)
+		self.room_options = self._padded(cls.ROOM_OPTIONS)
+		self.is_room = numpy.array([
+			bool(cls.ROOM_BITS[cell >> 3] & (1 << (cell & 7)))
+			for cell in range(len(cls.COORDS))])
+		self.opposite = numpy.array(
+			[game.OPPOSITE[d] for d in range(4)], numpy.int8)
+		self.deltas = numpy.array(
+			[game.DIRN_DELTAS[d] for d in range(4)], numpy.int64)
+
+		self.schedules = []
+		for t in self.monster_types:
+			self.schedules.append((
+				game.Monster.SLEEP_TIMES[t],
+				numpy.array(game.Monster.SCHEDULE_ENDS[t], numpy.int64),
+				numpy.array([game.MONSTER_MODE_IDS[name]
+							 for name in game.Monster.SCHEDULE_MODES[t]], numpy.int8),
+				cls.TARGETS.get(t),
+				game.Monster.CHASE_PROJECTION[t]))
+		# The modes each monster can move in, so move_monster only works
+		# out the moves its schedule can ask for.
+		self.move_modes = [
+			set(game.MONSTER_MODE_IDS[name] for name in game.Monster.SCHEDULE_MODES[t])
+			for t in self.monster_types]
+
+	def setup_routes(self):
+		"""The board's next-hop table, for hunt, loaded when first needed."""
+		cls = self.board_cls
+		cls.setup_routes()
+		count = len(cls.ROUTE_CELLS)
+		self.route_index = numpy.array(cls.ROUTE_INDEX, numpy.int32)
+		self.next_hop = numpy.frombuffer(
+			cls.NEXT_HOP.tostring(), numpy.uint8).reshape(count, count)
+
+	@staticmethod
+	def _padded(options):
+		table = numpy.empty((len(options), 4), numpy.int32)
+		table.fill(NO_CELL)
+		for cell, cells in enumerate(options):
+			table[cell, :len(cells)] = cells
+		return table
+
+	@classmethod
+	def from_boards(cls, boards):
+		"""Copy the state of `boards` (all the same class) into a new batch."""
+		board_cls = type(boards[0])
+		monster_types = list(boards[0].monsters)
+		batch = cls(board_cls, len(boards), monster_types)
+		for i, board in enumerate(boards):
+			if type(board) is not board_cls or list(board.monsters) != monster_types:
+				raise ValueError("Boards in a batch must all be the same")
+			batch.cell[i] = board.cell
+			batch.dirn[i] = board.dirn
+			batch.turn[i] = board.turn
+			batch.score[i] = board.score
+			batch.mode[i] = board.mode
+			batch.pills[i] = numpy.frombuffer(bytes(board.pill_bits), numpy.uint8)
+			batch.pill_count[i] = board.pill_count
+			for k, t in enumerate(monster_types):
+				monster = board.monsters[t]
+				batch.monster_cell[i, k] = monster.cell
+				batch.monster_dirn[i, k] = monster.dirn
+				batch.monster_mode[i, k] = game.MONSTER_MODE_IDS[monster.mode]
+				batch.move_modes[k].add(game.MONSTER_MODE_IDS[monster.mode])
+				batch.monster_mode_time[i, k] = monster.mode_time
+		return batch
+
+	@classmethod
+	def load(cls, blobs):
+		return cls.from_boards([game.Board.load(data) for data in blobs])
+
+	def apply(self, boards):
+		"""Copy the state of the batch back onto `boards`."""
+		for i, board in enumerate(boards):
+			board.cell = int(self.cell[i])
+			board.dirn = int(self.dirn[i])
+			board.turn = int(self.turn[i])
+			board.score = int(self.score[i])
+			board.mode = int(self.mode[i])
+			board.pill_bits = bytearray(self.pills[i].tostring())
+			board.pill_count = int(self.pill_count[i])
+			for k, t in enumerate(self.monster_types):
+				monster = board.monsters[t]
+				monster.cell = int(self.monster_cell[i, k])
+				monster.dirn = int(self.monster_dirn[i, k])
+				monster.mode = game.MONSTER_MODE_NAMES[int(self.monster_mode[i, k])]
+				monster.mode_time = int(self.monster_mode_time[i, k])
+
+	def closest(self, options, tx, ty):
+		"""Pick the option nearest (tx, ty) in each row of `options`.
+
+		Ties go to the smallest (x, y), as with game.closest.  Rows with
+		no options give NO_CELL.
+		"""
+		valid = options >= 0
+		safe = numpy.where(valid, options, 0)
+		ox = self.x[safe]
+		oy = self.y[safe]
+		dist = (ox - tx[:, None]) ** 2 + (oy - ty[:, None]) ** 2
+		key = numpy.where(valid, (dist << 16) | (ox << 8) | oy, NO_OPTION)
+		best = options[numpy.arange(len(options)), key.argmin(1)]
+		return numpy.where(valid.any(1), best, NO_CELL)
+
+	def set_mode(self, k, rows):
+		"""Monster.mode_at for monster `k` in each of `rows`."""
+		sleep, ends, mode_ids, _, _ = self.schedules[k]
+		remaining = self.turn[rows] - sleep
+		period = ends[-1]
+		remaining = numpy.where(remaining > 0, (remaining - 1) % period + 1, remaining)
+		index = numpy.searchsorted(ends, remaining, side="left")
+		self.monster_mode[rows, k] = mode_ids[index]
+		self.monster_mode_time[rows, k] = ends[index] - remaining
+
+	def move_monster(self, k, rows):
+		_, _, _, target, projection = self.schedules[k]
+		cell = self.monster_cell[rows, k]
+		dirn = self.monster_dirn[rows, k]
+		mode = self.monster_mode[rows, k]
+		count = len(rows)
+
+		# Monster.move_simple: leave the room, or follow a corridor.
+		in_room = self.is_room[cell]
+		exits = self.exit_targets[cell]
+		from_room = self.closest(
+			self.room_options[cell], self.x[exits], self.y[exits])
+		behind = self.steps[self.opposite[dirn], cell]
+		options = self.neighbours[cell]
+		options = numpy.where(options == behind[:, None], NO_CELL, options)
+		only = (options >= 0).sum(1) == 1
+		corridor = options.max(1)
+
+		# Monster.do_goto_fixed, Monster.do_chase and Monster.do_hunt, for
+		# the modes this monster can be in.
+		modes = self.move_modes[k]
+		chosen = numpy.empty(count, numpy.int32)
+		chosen.fill(NO_CELL)
+		fixed_id = game.MONSTER_MODE_IDS["fixed"]
+		if fixed_id in modes and target is not None:
+			fixed = self.closest(
+				options,
+				numpy.repeat(numpy.int64(target[0]), count),
+				numpy.repeat(numpy.int64(target[1]), count))
+			chosen = numpy.where(mode == fixed_id, fixed, chosen)
+		pacman = self.cell[rows]
+		chase_id = game.MONSTER_MODE_IDS["chase"]
+		if chase_id in modes:
+			delta = self.deltas[self.dirn[rows]] * projection
+			chase = self.closest(
+				options, self.x[pacman] + delta[:, 0], self.y[pacman] + delta[:, 1])
+			chosen = numpy.where(mode == chase_id, chase, chosen)
+		hunt_id = game.MONSTER_MODE_IDS["hunt"]
+		if hunt_id in modes:
+			hunt = self.hunt(cell, pacman, behind, options)
+			chosen = numpy.where(mode == hunt_id, hunt, chosen)
+
+		new_cell = numpy.where(
+			in_room, from_room, numpy.where(only, corridor, chosen))
+		moving = mode != game.MONSTER_MODE_IDS["sleep"]
+		if (new_cell[moving] < 0).any():
+			raise AssertionError("Monster has nowhere to go")
+		new_cell = numpy.where(moving, new_cell, cell)
+
+		# Monster.set_pos
+		old_x, old_y = self.x[cell], self.y[cell]
+		x, y = self.x[new_cell], self.y[new_cell]
+		new_dirn = numpy.where(
+			x == old_x, numpy.where(old_y > y, game.UP, game.DOWN), numpy.where(
+				y == old_y, numpy.where(old_x > x, game.LEFT, game.RIGHT), dirn))
+		warp = self.warp_targets[new_cell]
+		self.monster_dirn[rows, k] = numpy.where(moving, new_dirn, dirn)
+		self.monster_cell[rows, k] = numpy.where(moving & (warp >= 0), warp, new_cell)
+
+	def hunt(self, cell, pacman, behind, options):
+		"""Monster.do_hunt: the next hop towards pacman."""
+		if not hasattr(self, "next_hop"):
+			self.setup_routes()
+		source, dest = self.route_index[cell], self.route_index[pacman]
+		routed = (source >= 0) & (dest >= 0)
+		dirn = self.next_hop[numpy.where(routed, source, 0), numpy.where(routed, dest, 0)]
+		routed &= dirn != game.NO_ROUTE
+		hop = self.steps[numpy.where(routed, dirn, 0), cell]
+		hop = numpy.where(routed, hop, NO_CELL)
+		fallback = self.closest(options, self.x[pacman], self.y[pacman])
+		return numpy.where((hop < 0) | (hop == behind), fallback, hop)
+
+	def do_turn(self):
+		"""Play a turn of every game that is still in progress."""
+		self.mode[self.mode == game.NOT_STARTED] = game.STARTED
+		live = self.mode == game.STARTED
+		rows = numpy.flatnonzero(live)
+		self.turn[rows] += 1
+
+		# Pacman
+		cell = self.cell[rows]
+		new_cell = self.steps[self.dirn[rows], cell]
+		on_board = new_cell >= 0
+		safe = numpy.where(on_board, new_cell, 0)
+		warp = numpy.where(on_board, self.warp_targets[safe], NO_CELL)
+		step = on_board & (self.neighbours[cell] == new_cell[:, None]).any(1)
+		new_cell = numpy.where(warp >= 0, warp, new_cell)
+		self.cell[rows] = numpy.where((warp >= 0) | step, new_cell, cell)
+
+		safe = numpy.where(new_cell >= 0, new_cell, 0)
+		byte, bit = safe >> 3, (1 << (safe & 7)).astype(numpy.uint8)
+		eaten = (new_cell >= 0) & (self.pills[rows, byte] & bit != 0)
+		eaten_rows = rows[eaten]
+		self.pills[eaten_rows, byte[eaten]] &= ~bit[eaten]
+		self.pill_count[eaten_rows] -= 1
+		won = eaten_rows[self.pill_count[eaten_rows] == 0]
+		self.score[eaten_rows] += 20
+		self.score[won] += 500 - 20
+		self.mode[won] = game.WON
+		live[won] = False
+
+		# Monsters, in the order the board dict hands them out.
+		for k in range(len(self.monster_types)):
+			self.catch(k, live)
+			rows = numpy.flatnonzero(live)
+			due = rows[self.monster_mode_time[rows, k] <= 0]
+			self.set_mode(k, due)
+			self.move_monster(k, rows)
+			self.monster_mode_time[rows, k] -= 1
+			self.catch(k, live)
+
+	def catch(self, k, live):
+		caught = live & (self.monster_cell[:, k] == self.cell)
+		self.mode[caught] = game.GAME_OVER
+		live &= ~caught
+
+
+def compare(board_cls, games=200, turns=300, seed=0):
+	"""Play `games` random games of `board_cls` with both engines.
+
+	Pacman changes direction at random, identically in both engines.
+	Raises AssertionError at the first turn where the batch disagrees
+	with Board.do_turn.  Returns (scalar seconds, batch seconds).
+	"""
+	rnd = random.Random(seed)
+	boards = [board_cls() for i in range(games)]
+	batch = GameBatch.from_boards(boards)
+	check = [board_cls() for i in range(games)]
+	scalar_time = batch_time = 0
+	for turn in range(turns):
+		for i, board in enumerate(boards):
+			if rnd.random() < 0.3:
+				board.dirn = batch.dirn[i] = rnd.randrange(4)
+		start = time.time()
+		for board in boards:
+			if board.mode in (game.NOT_STARTED, game.STARTED):
+				board.do_turn()
+		scalar_time += time.time() - start
+		start = time.time()
+		batch.do_turn()
+		batch_time += time.time() - start
+		batch.apply(check)
+		for i, (board, other) in enumerate(zip(boards, check)):
+			expected = (board.dump(), board.mode)
+			if (other.dump(), other.mode) != expected:
+				raise AssertionError("Game %d differs at turn %d:\n%s\n%s" % (
+					i, turn, board.to_string(), other.to_string()))
+	return scalar_time, batch_time
+
+
+def main():
+	import printman.board
+	for board_cls in game.Board.__subclasses__():
+		if board_cls is game.MetaBoard:
+			continue
+		scalar_time, batch_time = compare(board_cls)
+		print "%s: ok (scalar %.2fs, batch %.2fs)" % (
+			board_cls.__name__, scalar_time, batch_time)
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -5,6 +5,7 @@ from google.appengine.ext import db
 
 import printman.board
 import printman.game
+import printman.qr
 
 
 class SavedGame(db.Model):
@@ -13,15 +14,27 @@ class SavedGame(db.Model):
   last_turn_time = db.DateTimeProperty()
 
 
+class SavedQR(db.Model):
+  """A game's QR code as a PNG, as a child of its SavedGame, named
+  after the host its URL points at.
+
+  Kept apart from the SavedGame, so that saving a QR code never writes
+  the game back over a move saved since it was read.
+  """
+  png = db.BlobProperty()
+
+
 def get_secret():
     return "%08x" % random.getrandbits(32)
 
 
-def _get_saved_game(key):
+def _split_key(key):
     game_id, secret = key.split(".", 1)
-    game_id = long(game_id)
+    return db.Key.from_path("SavedGame", long(game_id)), secret
 
-    game_key = db.Key.from_path("SavedGame", game_id)
+
+def _get_saved_game(key):
+    game_key, secret = _split_key(key)
     game = db.get(game_key)
     assert game.secret == secret
     return game
@@ -30,6 +43,22 @@ def _get_saved_game(key):
 TURN_TIME = datetime.timedelta(days=1)
 
 
+def _microseconds(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def turns_due(last_turn_time, now):
+    """Number of turns that have fallen due between `last_turn_time` and `now`.
+
+    A turn falls due once strictly more than TURN_TIME has passed since
+    the one before it, so a gap of exactly two days plays one turn.
+    """
+    elapsed = _microseconds(now - last_turn_time)
+    if elapsed <= 0:
+        return 0
+    return (elapsed - 1) // _microseconds(TURN_TIME)
+
+
 def get_game(key, update=False):
     saved_game = _get_saved_game(key)
     game = printman.game.Board.load(saved_game.save_data)
@@ -41,31 +70,72 @@ def get_game(key, update=False):
             modified = True
             saved_game.last_turn_time = datetime.datetime.now() - datetime.timedelta(hours=1)
         else:
-            while saved_game.last_turn_time + TURN_TIME < now:
-                modified=True
-                try:
-                    game.do_turn()
-                except AssertionError:
-                    pass
-                saved_game.last_turn_time += TURN_TIME
+            due = turns_due(saved_game.last_turn_time, now)
+            if due:
+                modified = True
+                game.fast_forward(due)
+                saved_game.last_turn_time += TURN_TIME * due
         if modified:
             saved_game.save_data = game.dump()
             db.put(saved_game)
     return game
 
 
-def new_game(game_type, key=None):
+def new_game(game_type, key=None, host=None):
+    """Start a game, returning its key.
+
+    If `host` is given, the game's QR code is drawn and saved with it,
+    so it never has to be drawn while a page is waiting for it.
+    """
     cls = getattr(printman.board, game_type)
     assert issubclass(cls, printman.game.Board), cls
     game = cls()
     if key is None:
-        saved_game = SavedGame(secret=get_secret())
+        # Reserve the id up front, as the QR code needs the game key
+        game_id, _ = db.allocate_ids(db.Key.from_path("SavedGame", 1), 1)
+        saved_game = SavedGame(key=db.Key.from_path("SavedGame", game_id),
+                               secret=get_secret())
     else:
         saved_game = _get_saved_game(key)
     saved_game.save_data=game.dump()
-    key = db.put(saved_game)
-    game_id = key.id()
-    return "%s.%s" % (game_id, saved_game.secret) 
+    game_key = "%s.%s" % (saved_game.key().id(), saved_game.secret)
+    if host is None:
+        db.put(saved_game)
+    else:
+        db.put([saved_game, _draw_qr(saved_game.key(), game_key, host)])
+    return game_key
+
+
+def _draw_qr(parent, game_key, host):
+    data = printman.qr.render_png(host, game_key)
+    printman.qr.CACHE.put((host, game_key), data)
+    return SavedQR(parent=parent, key_name=host, png=data)
+
+
+def get_qr_png(key, host):
+    """The game's QR code as a PNG.
+
+    It comes from this instance's cache if it can, then from the
+    game's SavedQR for `host`, and is only drawn (and saved) if neither
+    has it.  Only the SavedQR is written, never the game.
+    """
+    data = printman.qr.CACHE.get((host, key))
+    if data is not None:
+        printman.qr.STATS.hit()
+        return data
+    game_key, secret = _split_key(key)
+    # The game is read alongside to check the secret, as the picture
+    # gives it away.
+    saved_game, saved_qr = db.get(
+        [game_key, db.Key.from_path("SavedQR", host, parent=game_key)])
+    assert saved_game.secret == secret
+    if saved_qr is not None:
+        printman.qr.STATS.store_hit()
+        printman.qr.CACHE.put((host, key), saved_qr.png)
+        return saved_qr.png
+    saved_qr = _draw_qr(game_key, key, host)
+    saved_qr.put()
+    return saved_qr.png
 
 
 def update_game(key, game):